@@ -0,0 +1,282 @@
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import time
+
+from cache import content_hash
+from utils import AUDIO_EXTENSIONS
+
+ARCHIVE_FILENAME = "archive.sqlite3"
+SEARCH_LIMIT = 50
+SNIPPET_WORDS = 16  # Palabras alrededor de la coincidencia en cada resultado
+
+def default_archive_directory():
+    """Directorio por defecto del archivo de transcripciones: $XDG_DATA_HOME/transcribineitor
+    (no la caché: vaciarla no debe borrar el archivo)"""
+    base = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(base, "transcribineitor")
+
+def format_milliseconds(milliseconds):
+    """HH:MM:SS.mmm"""
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{milliseconds:03d}"
+
+def fts_query(text):
+    """Convierte lo que escribe el usuario en una consulta FTS5 segura: cada palabra entre
+    comillas (todas deben aparecer), las frases entre comillas se respetan y `palabra*`
+    busca por prefijo"""
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', text):
+        term = phrase if phrase else word
+        prefix = not phrase and term.endswith("*")
+        term = term.rstrip("*").replace('"', "")
+        if term.strip():
+            terms.append(f'"{term}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+class TranscriptArchive:
+    """Archivo de todas las transcripciones terminadas, con índice de texto completo (SQLite
+    FTS5) por frase: cada transcripción guarda el hash del audio, el modelo y el idioma, y
+    cada frase su texto e inicio y fin en milisegundos. El motor añade las frases a medida
+    que se escriben, así que un trabajo en curso ya es buscable"""
+
+    def __init__(self, directory=None):
+        self.path = os.path.join(directory or default_archive_directory(), ARCHIVE_FILENAME)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.connection = sqlite3.connect(self.path, timeout=30)
+        # WAL: varios procesos (lotes, servicio, interfaz) pueden escribir y buscar a la vez
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        with self.connection:
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS transcripts (
+                    id INTEGER PRIMARY KEY,
+                    source_hash TEXT NOT NULL,
+                    source_path TEXT NOT NULL,
+                    output_path TEXT,
+                    model TEXT,
+                    language TEXT,
+                    complete INTEGER NOT NULL DEFAULT 0,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS transcripts_source ON transcripts (source_hash, model);
+                CREATE INDEX IF NOT EXISTS transcripts_output ON transcripts (output_path);
+                CREATE TABLE IF NOT EXISTS segments (
+                    id INTEGER PRIMARY KEY,
+                    transcript_id INTEGER NOT NULL REFERENCES transcripts (id) ON DELETE CASCADE,
+                    start_ms INTEGER,
+                    end_ms INTEGER,
+                    text TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS segments_transcript ON segments (transcript_id, start_ms);
+                CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5 (
+                    text, content='segments', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+                );
+                CREATE TRIGGER IF NOT EXISTS segments_insert AFTER INSERT ON segments BEGIN
+                    INSERT INTO segments_fts (rowid, text) VALUES (new.id, new.text);
+                END;
+                CREATE TRIGGER IF NOT EXISTS segments_delete AFTER DELETE ON segments BEGIN
+                    INSERT INTO segments_fts (segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+                END;
+            """)
+
+    def begin(self, source_hash, source_path, output_path=None, model=None, language=None):
+        """Registra una transcripción que empieza. Sustituye a la del mismo audio, modelo y
+        salida si la había (un trabajo reanudado vuelve a añadir sus frases desde el diario).
+        Devuelve el id de la transcripción"""
+        now = time.time()
+        output_path = output_path and os.path.abspath(output_path)
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM transcripts WHERE source_hash = ? AND model IS ? AND output_path IS ?",
+                (source_hash, model, output_path)
+            )
+            cursor = self.connection.execute(
+                "INSERT INTO transcripts (source_hash, source_path, output_path, model, language, created, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (source_hash, os.path.abspath(source_path), output_path, model, language, now, now)
+            )
+        return cursor.lastrowid
+
+    def add_segments(self, transcript_id, segments, language=None):
+        """Añade frases (inicio y fin en segundos o None, texto) y las indexa en el acto"""
+        rows = [(transcript_id, _milliseconds(start), _milliseconds(end), text.strip())
+                for start, end, text in segments if text.strip()]
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO segments (transcript_id, start_ms, end_ms, text) VALUES (?, ?, ?, ?)", rows
+            )
+            self.connection.execute(
+                "UPDATE transcripts SET updated = ?, language = COALESCE(?, language) WHERE id = ?",
+                (time.time(), language, transcript_id)
+            )
+
+    def add_entry(self, transcript_id, entry):
+        """Añade una entrada del diario del motor: sus frases con tiempos, o el segmento entero"""
+        pieces = entry.get("pieces") or [[entry["start"], entry["end"], entry["text"]]]
+        self.add_segments(transcript_id, pieces, entry.get("language"))
+
+    def finish(self, transcript_id, language=None):
+        with self.connection:
+            self.connection.execute(
+                "UPDATE transcripts SET complete = 1, updated = ?, language = COALESCE(?, language) WHERE id = ?",
+                (time.time(), language, transcript_id)
+            )
+
+    def search(self, query, limit=SEARCH_LIMIT, offset=0, language=None, model=None):
+        """Frases que contienen todas las palabras de `query`, de más a menos relevante. Cada
+        resultado: transcripción, audio, salida, modelo, idioma, inicio y fin en ms, texto y
+        un fragmento con la coincidencia entre corchetes"""
+        match = fts_query(query)
+        if not match:
+            return []
+        sql = (
+            "SELECT t.id, t.source_path, t.output_path, t.model, t.language, t.complete, "
+            "s.start_ms, s.end_ms, s.text, snippet(segments_fts, 0, '[', ']', '…', ?) "
+            "FROM segments_fts JOIN segments s ON s.id = segments_fts.rowid "
+            "JOIN transcripts t ON t.id = s.transcript_id "
+            "WHERE segments_fts MATCH ?"
+        )
+        parameters = [SNIPPET_WORDS, match]
+        if language:
+            sql += " AND t.language = ?"
+            parameters.append(language)
+        if model:
+            sql += " AND t.model = ?"
+            parameters.append(model)
+        sql += " ORDER BY bm25(segments_fts), t.id, s.start_ms LIMIT ? OFFSET ?"
+        parameters += [limit, offset]
+        columns = ("transcript", "source_path", "output_path", "model", "language", "complete",
+                   "start_ms", "end_ms", "text", "snippet")
+        return [dict(zip(columns, row)) for row in self.connection.execute(sql, parameters)]
+
+    def segments(self, transcript_id):
+        """Frases de una transcripción en orden: (inicio ms, fin ms, texto)"""
+        return self.connection.execute(
+            "SELECT start_ms, end_ms, text FROM segments WHERE transcript_id = ? ORDER BY id", (transcript_id,)
+        ).fetchall()
+
+    def has_output(self, output_path):
+        return self.connection.execute(
+            "SELECT 1 FROM transcripts WHERE output_path = ?", (os.path.abspath(output_path),)
+        ).fetchone() is not None
+
+    def stats(self):
+        transcripts, complete = self.connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(complete), 0) FROM transcripts"
+        ).fetchone()
+        segments, milliseconds = self.connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(end_ms - start_ms), 0) FROM segments"
+        ).fetchone()
+        return {"path": self.path, "transcripts": transcripts, "complete": complete, "segments": segments,
+                "milliseconds": milliseconds}
+
+    def close(self):
+        self.connection.close()
+
+def _milliseconds(seconds):
+    return None if seconds is None else int(round(seconds * 1000))
+
+def source_audio(text_path):
+    """Audio del que salió una transcripción con el nombre sugerido
+    (<nombre>_transcripcion.txt), buscándolo junto a ella; None si no está"""
+    directory, name = os.path.split(text_path)
+    base = re.sub(r"_transcripcion$", "", os.path.splitext(name)[0])
+    for extension in AUDIO_EXTENSIONS:
+        candidate = os.path.join(directory, base + extension)
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+def text_sentences(text):
+    """Divide un texto plano en frases (sin tiempos)"""
+    return [sentence.strip() for sentence in re.split(r"(?<=[.!?…])\s+", text) if sentence.strip()]
+
+def collect_text_files(sources):
+    """Archivos .txt de una lista de archivos y directorios (recorridos recursivamente)"""
+    files = []
+    for source in sources:
+        if os.path.isdir(source):
+            for root, _, names in os.walk(source):
+                files.extend(os.path.join(root, name) for name in sorted(names) if name.lower().endswith(".txt"))
+        elif os.path.isfile(source):
+            files.append(source)
+    return files
+
+def import_texts(archive, sources, log=print):
+    """Importa transcripciones .txt existentes (sin tiempos, modelo ni idioma conocidos).
+    El hash es el del audio si se encuentra junto al texto y, si no, el del propio texto.
+    Los textos ya archivados se omiten. Devuelve cuántos se importaron"""
+    imported = 0
+    for text_path in collect_text_files(sources):
+        if archive.has_output(text_path):
+            continue
+        try:
+            with open(text_path, "r", encoding="utf-8") as file:
+                text = file.read()
+        except (OSError, UnicodeDecodeError) as e:
+            log(f"Omitido {text_path}: {e}")
+            continue
+        audio_path = source_audio(text_path)
+        source_path = audio_path or text_path
+        transcript_id = archive.begin(content_hash(source_path), source_path, text_path)
+        archive.add_segments(transcript_id, [(None, None, sentence) for sentence in text_sentences(text)])
+        archive.finish(transcript_id)
+        imported += 1
+    return imported
+
+def format_times(hit):
+    if hit["start_ms"] is None:
+        return "sin tiempos"
+    return f"{format_milliseconds(hit['start_ms'])} - {format_milliseconds(hit['end_ms'])}"
+
+def format_hit(hit):
+    """Una línea por resultado: audio, tiempos en milisegundos y fragmento"""
+    return f"{hit['source_path']}  [{format_times(hit)}]  {hit['snippet']}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m archive",
+                                     description="Busca en el archivo de transcripciones o importa textos existentes")
+    parser.add_argument("--directory", help="Directorio del archivo (por defecto, el del usuario)")
+    subparsers = parser.add_subparsers(dest="action", required=True)
+    search_parser = subparsers.add_parser("search", help="Buscar frases (todas las palabras; \"frase exacta\"; prefijo*)")
+    search_parser.add_argument("query", nargs="+")
+    search_parser.add_argument("-n", "--limit", type=int, default=SEARCH_LIMIT, help="Resultados como máximo")
+    search_parser.add_argument("-l", "--language", help="Sólo transcripciones en este idioma")
+    search_parser.add_argument("-m", "--model", help="Sólo transcripciones de este modelo")
+    import_parser = subparsers.add_parser("import", help="Importar transcripciones .txt de archivos o carpetas")
+    import_parser.add_argument("sources", nargs="+")
+    subparsers.add_parser("info", help="Resumen del archivo")
+    args = parser.parse_args(argv)
+
+    # Importación local: el archivo también se usa desde procesos que no leen la configuración
+    from config_manager import ConfigManager
+    archive = TranscriptArchive(args.directory or ConfigManager().get_archive_directory() or None)
+    try:
+        if args.action == "search":
+            hits = archive.search(" ".join(args.query), args.limit, language=args.language, model=args.model)
+            for hit in hits:
+                print(format_hit(hit))
+            if not hits:
+                print("Sin resultados", file=sys.stderr)
+                return 1
+        elif args.action == "import":
+            imported = import_texts(archive, args.sources, log=lambda message: print(message, file=sys.stderr))
+            print(f"Importadas {imported} transcripciones")
+        else:
+            stats = archive.stats()
+            print(f"Archivo: {stats['path']}")
+            print(f"Transcripciones: {stats['transcripts']} ({stats['complete']} completas)  "
+                  f"Frases: {stats['segments']}  Audio con tiempos: {stats['milliseconds'] / 3_600_000:.1f} h")
+    finally:
+        archive.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+import argparse
+import os
+import re
+import sys
+import tempfile
+
+import torch
+import whisper
+from torch import nn
+
+from model_manager import DEFAULT_BACKEND, model_size
+
+class InferenceBackend:
+    """Motor de inferencia: construye un modelo con la interfaz que usa el motor de
+    transcripción (`dims`, `device` y `decode(mel, options)` por lotes)"""
+    name = None
+    description = ""
+
+    def available(self):
+        return True
+
+    def load(self, model_name, device=None):
+        """Devuelve (modelo, bytes que ocupa en memoria)"""
+        raise NotImplementedError
+
+class Fp32Backend(InferenceBackend):
+    name = "fp32"
+    description = "Whisper de referencia (fp32 en CPU, fp16 en GPU)"
+
+    def load(self, model_name, device=None):
+        model = whisper.load_model(model_name, device=device)
+        return model, model_size(model)
+
+class Int8Backend(InferenceBackend):
+    """Cuantización dinámica a int8 de las capas lineales (atención y MLP), que concentran
+    casi todo el cálculo del decoder. Los pesos se cuantizan al cargar; las activaciones en
+    cada llamada. Sólo CPU"""
+    name = "int8"
+    description = "Whisper con capas lineales cuantizadas a int8 (sólo CPU)"
+
+    # Motores de operaciones cuantizadas con los que funciona quantize_dynamic, por
+    # preferencia. supported_engines incluye siempre 'none', que no sirve
+    engines = ("x86", "fbgemm", "qnnpack")
+
+    def available(self):
+        return any(engine in torch.backends.quantized.supported_engines for engine in self.engines)
+
+    def load(self, model_name, device=None):
+        if torch.backends.quantized.engine not in self.engines:
+            supported = torch.backends.quantized.supported_engines
+            torch.backends.quantized.engine = next(engine for engine in self.engines if engine in supported)
+        model = whisper.load_model(model_name, device="cpu")
+        linear_bytes = 0
+        for module in model.modules():
+            if isinstance(module, nn.Linear):
+                # whisper.model.Linear sólo adapta el dtype para fp16; quantize_dynamic
+                # exige la clase exacta nn.Linear
+                module.__class__ = nn.Linear
+                linear_bytes += module.weight.numel() * module.weight.element_size()
+        size = model_size(model) - linear_bytes * 3 // 4  # Pesos de 4 bytes a 1 byte
+        model = torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+        return model, size
+
+BACKENDS = {backend.name: backend for backend in (Fp32Backend(), Int8Backend())}
+
+def get_backend(name=DEFAULT_BACKEND):
+    backend = BACKENDS.get(name)
+    if backend is None:
+        raise ValueError(f"Motor de inferencia desconocido: {name}")
+    if not backend.available():
+        raise RuntimeError(f"El motor '{name}' no está disponible en este equipo")
+    return backend
+
+def normalize_words(text):
+    """Palabras en minúsculas y sin puntuación, para comparar transcripciones"""
+    return re.findall(r"\w+", text.lower())
+
+def word_error_rate(reference, hypothesis):
+    """WER: sustituciones, inserciones y borrados (distancia de Levenshtein por palabras)
+    divididos entre las palabras de la referencia"""
+    reference, hypothesis = normalize_words(reference), normalize_words(hypothesis)
+    if not reference:
+        return 0.0 if not hypothesis else 1.0
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1] / len(reference)
+
+def compare(file_paths, model_name, backends, language=None, batch_size=None):
+    """Transcribe cada archivo con fp32 (referencia) y con cada motor de `backends`.
+    Devuelve {motor: {"wer", "rtf", "speedup"}} con el WER medio y el RTF total"""
+    from engine import transcribe_file
+
+    totals = {}
+    texts = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for backend in [DEFAULT_BACKEND] + [name for name in backends if name != DEFAULT_BACKEND]:
+            elapsed = duration = 0.0
+            for i, file_path in enumerate(file_paths):
+                output = os.path.join(directory, f"{backend}-{i}.txt")
+                summary = transcribe_file(file_path, output, batch_size, model_name=model_name, use_cache=False,
+                                          language=language, backend=backend, use_archive=False)
+                elapsed += summary["elapsed"]
+                duration += summary["audio_processed"]
+                with open(output, "r", encoding="utf-8") as file:
+                    texts[backend, file_path] = file.read()
+            totals[backend] = elapsed / duration if duration else None
+
+    reference_rtf = totals[DEFAULT_BACKEND]
+    results = {}
+    for backend, rtf in totals.items():
+        wers = [word_error_rate(texts[DEFAULT_BACKEND, path], texts[backend, path]) for path in file_paths]
+        results[backend] = {
+            "wer": sum(wers) / len(wers),
+            "rtf": rtf,
+            "speedup": reference_rtf / rtf if rtf and reference_rtf else None,
+        }
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m backends",
+                                     description="Lista los motores de inferencia o compara su precisión y velocidad")
+    subparsers = parser.add_subparsers(dest="action", required=True)
+    subparsers.add_parser("list", help="Motores disponibles")
+    compare_parser = subparsers.add_parser("compare", help="WER y factor de tiempo real frente a fp32")
+    compare_parser.add_argument("inputs", nargs="*",
+                                help="Audios de prueba (por defecto, los fixtures sintéticos del benchmark)")
+    compare_parser.add_argument("-m", "--model", default="base", help="Tamaño del modelo Whisper")
+    compare_parser.add_argument("--backends", nargs="+", default=["int8"], choices=list(BACKENDS),
+                                help="Motores a comparar con fp32")
+    compare_parser.add_argument("-l", "--language", help="Código de idioma; fijarlo evita diferencias de detección")
+    compare_parser.add_argument("-b", "--batch-size", type=int)
+    args = parser.parse_args(argv)
+
+    if args.action == "list":
+        for backend in BACKENDS.values():
+            status = "" if backend.available() else " (no disponible)"
+            print(f"{backend.name:<6} {backend.description}{status}")
+        return 0
+
+    with tempfile.TemporaryDirectory() as directory:
+        inputs = args.inputs
+        if not inputs:
+            from benchmark import create_fixtures
+            fixtures = create_fixtures(directory)
+            inputs = [fixtures["lecture"], fixtures["tone"]]
+        results = compare(inputs, args.model, args.backends, args.language, args.batch_size)
+
+    print(f"{'motor':<6} {'WER':>7} {'RTF':>8} {'aceleración':>12}")
+    for backend, row in results.items():
+        speedup = f"{row['speedup']:.2f}x" if row["speedup"] else "-"
+        rtf = f"{row['rtf']:.3f}" if row["rtf"] is not None else "-"
+        print(f"{backend:<6} {row['wer']:7.1%} {rtf:>8} {speedup:>12}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
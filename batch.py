@@ -0,0 +1,94 @@
+import multiprocessing
+import os
+import queue
+
+import torch
+from engine import DEFAULT_BACKEND, DEFAULT_MODEL, auto_batch_size, get_model, transcribe_file
+from utils import batch_output_paths
+
+# Estado de cada proceso trabajador (inicializado por _init_worker)
+_events = None
+_job_options = {}
+_workers = 1
+
+def default_workers():
+    """Procesos por defecto: la mitad de los núcleos, cada uno con al menos dos hilos de torch"""
+    return max(1, (os.cpu_count() or 1) // 2)
+
+def _init_worker(events, threads, workers, job_options):
+    """Inicializa un proceso trabajador: limita los hilos de torch. `job_options` son los
+    argumentos de transcribe_file comunes a todos los archivos. El modelo se carga con el
+    primer archivo: si fallara aquí, el pool relanzaría trabajadores sin fin"""
+    global _events, _job_options, _workers
+    _events = events
+    _job_options = dict(job_options)
+    _workers = workers
+    torch.set_num_threads(threads)
+
+def _worker_options():
+    """Opciones de transcribe_file del trabajador; la primera vez carga el modelo para
+    calcular el lote, y un fallo se informa como error del archivo"""
+    if not _job_options.get("batch_size"):
+        model = get_model(_job_options.get("model_name", DEFAULT_MODEL), _job_options.get("backend", DEFAULT_BACKEND))
+        # La memoria libre se reparte entre todos los trabajadores
+        _job_options["batch_size"] = max(1, auto_batch_size(model) // _workers)
+    return _job_options
+
+def _transcribe_one(job):
+    """Transcribe un archivo dentro del trabajador; los errores se devuelven, no se propagan,
+    para que un archivo defectuoso no detenga el resto del lote"""
+    file_path, output_path = job
+    try:
+        transcribe_file(file_path, output_path,
+                        progress_callback=lambda percent: _events.put((file_path, percent)),
+                        **_worker_options())
+        error = None
+    except Exception as e:
+        error = str(e)
+    _events.put((file_path, 100))
+    return file_path, output_path, error
+
+def transcribe_batch(file_paths, output_dir=None, workers=None, progress_callback=None, output_format="txt",
+                     threads=None, **job_options):
+    """Transcribe varios archivos en paralelo con un pool de procesos, cada uno con su modelo
+    y `threads` hilos de torch (por defecto, los núcleos repartidos entre los procesos).
+    `progress_callback(file_path, percent)` se invoca en el proceso llamador y `job_options`
+    (model_name, batch_size, use_cache, use_vad, language...) se pasan a transcribe_file.
+    Devuelve una lista de tuplas (archivo, salida, error) en el orden de entrada. Lanza
+    ValueError si dos archivos tendrían la misma salida"""
+    if not file_paths:
+        return []
+
+    workers = max(1, min(workers or default_workers(), len(file_paths)))
+    threads = threads or max(1, (os.cpu_count() or 1) // workers)
+    jobs = list(zip(file_paths, batch_output_paths(file_paths, output_dir, output_format)))
+    for _, output_path in jobs:
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+
+    # "spawn" evita heredar el estado de los hilos de torch del proceso padre
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager:
+        events = manager.Queue()
+        with context.Pool(workers, initializer=_init_worker, initargs=(events, threads, workers, job_options)) as pool:
+            pending = pool.map_async(_transcribe_one, jobs, chunksize=1)
+
+            while True:
+                try:
+                    file_path, percent = events.get(timeout=0.2)
+                except queue.Empty:
+                    if pending.ready():
+                        break
+                    continue
+                if progress_callback:
+                    progress_callback(file_path, percent)
+
+            # Vaciar los eventos que llegaron justo antes de terminar
+            while True:
+                try:
+                    file_path, percent = events.get_nowait()
+                except queue.Empty:
+                    break
+                if progress_callback:
+                    progress_callback(file_path, percent)
+
+            return pending.get()
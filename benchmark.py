@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from types import SimpleNamespace
+
+import numpy as np
+import torch
+from whisper.audio import SAMPLE_RATE
+from whisper.model import ModelDimensions
+
+import engine
+from profiler import peak_rss
+
+REGRESSION_THRESHOLD = 0.10  # Empeoramiento relativo a partir del cual se marca una métrica
+
+# Métricas donde un valor mayor es mejor; en el resto (tiempos, memoria) menor es mejor
+HIGHER_IS_BETTER = ("split_audio_x_realtime", "stream_x_realtime", "vad_x_realtime", "segments_per_second")
+
+# Fixtures sintéticos: (nombre, segundos, patrón)
+FIXTURES = (
+    ("tone", 60, "tone"),
+    ("noise", 60, "noise"),
+    ("silence", 60, "silence"),
+    ("lecture", 300, "bursts"),
+)
+
+def synthesize(pattern, seconds, seed=0):
+    """Genera audio sintético reproducible (16 kHz, mono, float32) sin descargas"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    if pattern == "tone":
+        return (0.5 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+    if pattern == "noise":
+        return (0.1 * rng.standard_normal(len(t))).astype(np.float32)
+    if pattern == "silence":
+        return np.zeros(len(t), dtype=np.float32)
+    # "bursts": 4 s de "voz" (tono modulado) y 2 s de silencio con ruido de fondo, un tercio de silencio
+    voice = 0.4 * np.sin(2 * np.pi * 220 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t))
+    gate = (t % 6) < 4
+    return (voice * gate + 0.002 * rng.standard_normal(len(t))).astype(np.float32)
+
+def write_wav(path, audio):
+    pcm = (np.clip(audio, -1, 1) * 32767).astype(np.int16)
+    with wave.open(path, "wb") as file:
+        file.setnchannels(1)
+        file.setsampwidth(2)
+        file.setframerate(SAMPLE_RATE)
+        file.writeframes(pcm.tobytes())
+
+def create_fixtures(directory, scale=1.0):
+    paths = {}
+    for seed, (name, seconds, pattern) in enumerate(FIXTURES):
+        path = os.path.join(directory, f"{name}.wav")
+        write_wav(path, synthesize(pattern, seconds * scale, seed))
+        paths[name] = path
+    return paths
+
+class StubModel:
+    """Modelo de prueba con la interfaz que usa el motor (dims, device, decode). Hace una
+    carga de cálculo fija por segmento en lugar de inferencia real, así el benchmark no
+    necesita pesos de Whisper y mide sólo el coste del pipeline"""
+
+    def __init__(self, work=64):
+        self.dims = ModelDimensions(
+            n_mels=80, n_audio_ctx=1500, n_audio_state=384, n_audio_head=6, n_audio_layer=4,
+            n_vocab=51865, n_text_ctx=448, n_text_state=384, n_text_head=6, n_text_layer=4
+        )
+        self.device = torch.device("cpu")
+        self.is_multilingual = True
+        self.num_languages = 99
+        self.weights = torch.randn(self.dims.n_mels, work, generator=torch.Generator().manual_seed(0))
+
+    def decode(self, mel, options):
+        single = mel.ndim == 2
+        batch = mel.unsqueeze(0) if single else mel
+        energy = (batch.transpose(1, 2) @ self.weights).abs().mean(dim=(1, 2))
+        results = [
+            SimpleNamespace(text=f" stub {value:.3f}", language=options.language or "es", tokens=[],
+                            no_speech_prob=0.0, avg_logprob=-0.1, compression_ratio=1.0, temperature=0.0)
+            for value in energy.tolist()
+        ]
+        return results[0] if single else results
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+def bench_segmentation(paths):
+    path = paths["lecture"]
+    duration = engine.probe_duration(path)
+    split_time, _ = timed(engine.split_audio, path)
+    stream_time, _ = timed(lambda: sum(1 for _ in engine.stream_audio(path)))
+    vad_time, _ = timed(lambda: sum(1 for _ in engine.speech_segments(path)))
+    return {
+        "split_audio_x_realtime": duration / split_time,
+        "stream_x_realtime": duration / stream_time,
+        "vad_x_realtime": duration / vad_time,
+    }
+
+def bench_segments(model, paths, batch_size):
+    """Rendimiento de mel + decodificación por segmento, sin E/S de disco"""
+    segments = engine.split_audio(paths["tone"])
+    mels = [engine.prepare_segment(segment, model.dims.n_mels) for segment in segments]
+    session = engine.DecodeSession(model, language="es")
+    elapsed, _ = timed(lambda: [session.decode_batch(batch) for batch in engine.batched(mels, batch_size)])
+    return {"segments_per_second": len(mels) / elapsed}
+
+def bench_end_to_end(model_name, paths, output_dir, batch_size):
+    metrics = {}
+    for name in ("lecture", "silence"):
+        output = os.path.join(output_dir, f"{name}.txt")
+        summary = engine.transcribe_file(paths[name], output, batch_size, model_name=model_name, use_cache=False,
+                                         use_archive=False)
+        metrics[f"rtf_{name}"] = summary["rtf"] if summary["rtf"] is not None else 0.0
+    return metrics
+
+def bench_startup(repeats=3):
+    """Tiempo de importar la interfaz en un proceso nuevo (mediana de varias ejecuciones)"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import main"], cwd=here, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return {"startup_seconds": sorted(times)[len(times) // 2]}
+
+def run(model_name="stub", scale=1.0, batch_size=4, skip_startup=False):
+    if model_name == "stub":
+        engine.model_manager.register("stub", StubModel(), size=0)
+    model = engine.get_model(model_name)
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = create_fixtures(directory, scale)
+        metrics = {}
+        metrics.update(bench_segmentation(paths))
+        metrics.update(bench_segments(model, paths, batch_size))
+        metrics.update(bench_end_to_end(model_name, paths, directory, batch_size))
+    if not skip_startup:
+        metrics.update(bench_startup())
+    metrics["peak_rss_mb"] = (peak_rss() or 0) / 1024 ** 2
+
+    return {
+        "model": model_name,
+        "scale": scale,
+        "batch_size": batch_size,
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.time(),
+        "metrics": metrics,
+    }
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """Compara con una ejecución previa. Devuelve [(métrica, actual, base, cambio, regresión)]"""
+    rows = []
+    for name, value in results["metrics"].items():
+        previous = baseline.get("metrics", {}).get(name)
+        if not previous:
+            continue
+        change = (value - previous) / previous
+        worse = -change if name in HIGHER_IS_BETTER else change
+        rows.append((name, value, previous, change, worse > threshold))
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmark", description="Benchmark reproducible del pipeline")
+    parser.add_argument("-m", "--model", default="stub", help="'stub' (sin pesos) o un tamaño de Whisper")
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="Archivo JSON de resultados")
+    parser.add_argument("--baseline", help="Resultados previos con los que comparar")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplicador de la duración de los fixtures")
+    parser.add_argument("-b", "--batch-size", type=int, default=4)
+    parser.add_argument("--skip-startup", action="store_true", help="No medir el tiempo de arranque")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Salir con error si alguna métrica empeora")
+    args = parser.parse_args(argv)
+
+    results = run(args.model, args.scale, args.batch_size, args.skip_startup)
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+
+    for name, value in results["metrics"].items():
+        print(f"{name:<24} {value:12.3f}")
+
+    regressions = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        print(f"\nComparación con {args.baseline}:")
+        for name, value, previous, change, regression in compare(results, baseline):
+            flag = "  REGRESIÓN" if regression else ""
+            print(f"{name:<24} {previous:12.3f} -> {value:12.3f} ({change:+.1%}){flag}")
+            regressions += regression
+
+    return 1 if args.fail_on_regression and regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+import argparse
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+HASH_BLOCK_SIZE = 1024 * 1024
+CACHE_FILENAME = "cache.sqlite3"
+
+def default_cache_directory():
+    """Directorio por defecto de la caché: $XDG_CACHE_HOME/transcribineitor"""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "transcribineitor")
+
+def segment_key(audio, signature):
+    """Clave de un segmento: hash de sus muestras decodificadas más la firma de decodificación"""
+    digest = hashlib.sha256(signature.encode("utf-8"))
+    digest.update(memoryview(audio).cast("B"))
+    return "segment:" + digest.hexdigest()
+
+def content_hash(file_path):
+    """SHA-256 del contenido de un archivo, leído por bloques"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def file_key(file_path, signature, content=None):
+    """Clave de un archivo completo: hash de su contenido más la firma de decodificación.
+    `content` evita releer el archivo si ya se calculó su content_hash"""
+    content = content or content_hash(file_path)
+    return "file:" + hashlib.sha256(f"{signature}|{content}".encode("utf-8")).hexdigest()
+
+class TranscriptionCache:
+    """Caché persistente de transcripciones direccionada por contenido, con desalojo LRU
+    cuando el tamaño total supera `max_bytes`"""
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = os.path.join(directory or default_cache_directory(), CACHE_FILENAME)
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.connection = sqlite3.connect(self.path, timeout=30)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        self.connection.commit()
+
+    def get(self, key):
+        """Devuelve el texto guardado para `key` o None, marcándolo como usado recientemente"""
+        row = self.connection.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        with self.connection:
+            self.connection.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def put(self, key, value):
+        size = len(value.encode("utf-8")) + len(key)
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time())
+            )
+        self.evict()
+
+    def total_size(self):
+        return self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def evict(self):
+        """Elimina las entradas usadas hace más tiempo hasta quedar dentro del presupuesto"""
+        excess = self.total_size() - self.max_bytes
+        if excess <= 0:
+            return
+        freed = 0
+        stale = []
+        for key, size in self.connection.execute("SELECT key, size FROM entries ORDER BY last_access"):
+            stale.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        with self.connection:
+            self.connection.executemany("DELETE FROM entries WHERE key = ?", stale)
+
+    def stats(self):
+        """Resumen de la caché: ruta, número de entradas por tipo y tamaño ocupado"""
+        rows = self.connection.execute(
+            "SELECT substr(key, 1, instr(key, ':') - 1), COUNT(*) FROM entries GROUP BY 1"
+        ).fetchall()
+        counts = dict(rows)
+        return {
+            "path": self.path,
+            "files": counts.get("file", 0),
+            "segments": counts.get("segment", 0),
+            "bytes": self.total_size(),
+            "max_bytes": self.max_bytes,
+        }
+
+    def clear(self):
+        with self.connection:
+            self.connection.execute("DELETE FROM entries")
+        self.connection.execute("VACUUM")
+
+    def close(self):
+        self.connection.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m cache", description="Inspecciona o vacía la caché de transcripciones")
+    parser.add_argument("action", choices=("info", "clear"))
+    parser.add_argument("--directory", help="Directorio de la caché (por defecto, el del usuario)")
+    args = parser.parse_args(argv)
+
+    # Importación local: la caché también se usa desde procesos que no leen la configuración
+    from config_manager import ConfigManager
+    cache = TranscriptionCache(args.directory or ConfigManager().get_cache_directory() or None)
+    try:
+        if args.action == "clear":
+            cache.clear()
+        stats = cache.stats()
+    finally:
+        cache.close()
+
+    print(f"Caché: {stats['path']}")
+    print(f"Archivos: {stats['files']}  Segmentos: {stats['segments']}")
+    print(f"Tamaño: {stats['bytes'] / 1024:.1f} KiB de {stats['max_bytes'] / 1024 / 1024:.0f} MiB")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+import argparse
+import glob
+import os
+import sys
+
+import torch
+from backends import BACKENDS
+from batch import transcribe_batch
+from config_manager import ConfigManager
+from engine import DEFAULT_MODEL, OUTPUT_FORMATS, model_manager, transcribe_file
+from model_manager import DEFAULT_BACKEND, MODEL_SIZES
+from tuner import ensure_profile, resources
+from utils import batch_output_paths, collect_audio_files
+
+def expand_inputs(patterns):
+    """Expande patrones glob, archivos y directorios en la lista de audios a transcribir"""
+    sources = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True))
+        sources.extend(matches if matches else [pattern])
+    return collect_audio_files(sources)
+
+def build_parser(config=None):
+    """Los valores por defecto del motor salen de config.json, compartido con la interfaz"""
+    config = config or ConfigManager()
+    parser = argparse.ArgumentParser(
+        prog="python -m cli",
+        description="Transcribe archivos de audio con Whisper sin interfaz gráfica"
+    )
+    parser.add_argument("inputs", nargs="+", help="Archivos, directorios o patrones glob de audio")
+    parser.add_argument("-o", "--output-dir", help="Directorio de salida (por defecto, junto a cada audio)")
+    parser.add_argument("-f", "--format", choices=OUTPUT_FORMATS, default="txt", help="Formato de salida")
+    parser.add_argument("-m", "--model", choices=MODEL_SIZES, default=config.get_model() or DEFAULT_MODEL,
+                        help="Tamaño del modelo Whisper")
+    parser.add_argument("--backend", choices=list(BACKENDS), default=config.get_backend() or DEFAULT_BACKEND,
+                        help="Motor de inferencia: fp32 (referencia) o int8 (cuantizado, más rápido en CPU)")
+    parser.add_argument("-j", "--jobs", type=int,
+                        help="Procesos en paralelo (por defecto, los del perfil medido para este equipo)")
+    parser.add_argument("-t", "--threads", type=int, help="Hilos de torch por proceso (por defecto, los del perfil)")
+    parser.add_argument("-b", "--batch-size", type=int,
+                        help="Segmentos por lote de inferencia (por defecto, el del perfil o automático)")
+    parser.add_argument("--model-memory", type=int, default=config.get_model_memory_budget(), metavar="MB",
+                        help="MB que pueden ocupar los modelos cargados (por defecto, la mitad de la RAM)")
+    parser.add_argument("-l", "--language", help="Código de idioma (p. ej. es, en); por defecto se detecta una vez")
+    parser.add_argument("--profile-log", help="Archivo JSON-lines donde registrar tiempos por etapa y segmento")
+    parser.add_argument("--cache-dir", default=config.get_cache_directory() or None,
+                        help="Directorio de la caché de transcripciones")
+    parser.add_argument("--no-cache", action="store_true", help="No leer ni guardar en la caché de transcripciones")
+    parser.add_argument("--archive-dir", default=config.get_archive_directory() or None,
+                        help="Directorio del archivo de transcripciones con búsqueda")
+    parser.add_argument("--no-archive", action="store_true", help="No añadir las transcripciones al archivo")
+    parser.add_argument("--no-vad", action="store_true",
+                        help="Cortar cada 30 s en lugar de segmentar por actividad de voz")
+    parser.add_argument("--no-tune", action="store_true",
+                        help="No medir el rendimiento del equipo aunque no haya perfil guardado")
+    return parser
+
+def main(argv=None):
+    config = ConfigManager()
+    args = build_parser(config).parse_args(argv)
+
+    files = expand_inputs(args.inputs)
+    if not files:
+        print("Error: no se encontraron archivos de audio", file=sys.stderr)
+        return 1
+
+    # Con -o se conserva la estructura de carpetas: a/x.mp3 y b/x.mp3 no deben pisarse
+    try:
+        output_paths = batch_output_paths(files, args.output_dir, args.format)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    for output_path in output_paths:
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+
+    def on_progress(file_path, percent):
+        print(f"[{percent:3d}%] {file_path}", file=sys.stderr)
+
+    # Los argumentos mandan sobre config.json, y éste sobre el perfil medido
+    if not args.no_tune:
+        ensure_profile(config, args.model, log=lambda message: print(message, file=sys.stderr))
+    plan = resources(config, args.model, parallel=len(files) > 1 and args.jobs != 1)
+    workers = args.jobs or plan["workers"]
+    threads = args.threads
+    if not threads and workers == plan["workers"]:
+        threads = plan["threads"]
+
+    model_manager.set_memory_budget(args.model_memory * 1024 ** 2)
+    job_options = {
+        "batch_size": args.batch_size or plan["batch_size"],
+        "model_name": args.model,
+        "backend": args.backend,
+        "use_cache": not args.no_cache,
+        "use_vad": not args.no_vad,
+        "language": args.language,
+        "profile_log": args.profile_log,
+        "cache_directory": args.cache_dir,
+        "use_archive": not args.no_archive,
+        "archive_directory": args.archive_dir,
+    }
+
+    if workers > 1 and len(files) > 1:
+        results = transcribe_batch(files, args.output_dir, workers, on_progress, args.format, threads,
+                                   **job_options)
+    else:
+        # Un solo proceso: evita el coste de arrancar un pool y cargar el modelo otra vez
+        if threads:
+            torch.set_num_threads(threads)
+        results = []
+        for file_path, output_path in zip(files, output_paths):
+            try:
+                transcribe_file(file_path, output_path,
+                                progress_callback=lambda percent: on_progress(file_path, percent), **job_options)
+                results.append((file_path, output_path, None))
+            except Exception as e:
+                results.append((file_path, output_path, str(e)))
+
+    failed = 0
+    for file_path, output_path, error in results:
+        if error:
+            failed += 1
+            print(f"Error en {file_path}: {error}", file=sys.stderr)
+        else:
+            print(output_path)
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
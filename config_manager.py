@@ -1,15 +1,58 @@
+import atexit
 import json
 import os
+import tempfile
+import threading
+
+SAVE_DELAY = 0.5  # Segundos que se agrupan los cambios antes de escribir el archivo
 
 class ConfigManager:
-    def __init__(self):
-        self.config_file = "config.json"
+    def __init__(self, config_file=None):
+        # Junto al código, no en el directorio de trabajo actual
+        self.config_file = config_file or os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
         self.default_config = {
             "dark_mode": False,
             "last_audio_directory": "",
-            "last_output_directory": ""
+            "last_output_directory": "",
+            # Ajustes del motor; 0 o "" significa automático / valor por defecto
+            "model": "base",
+            "backend": "fp32",
+            "threads": 0,
+            "batch_size": 0,
+            "workers": 0,
+            # MB que pueden ocupar los modelos cargados a la vez; 0 = la mitad de la RAM
+            "model_memory_budget": 0,
+            # Segundos objetivo entre que se oye una palabra y se confirma en el modo en vivo
+            "live_latency": 2.0,
+            "cache_directory": "",
+            # Archivo de transcripciones con búsqueda (archive.py); "" = directorio por defecto
+            "archive_directory": "",
+            # Dirección del servicio local (service.py); "" = cargar el motor en la propia ventana
+            "service_url": "",
+            # Perfiles medidos por el ajuste automático (tuner.py), uno por modelo
+            "tuned_profiles": {}
         }
-    
+        self._config = None
+        self._mtime = None
+        self._dirty = False
+        self._timer = None
+        self._lock = threading.RLock()
+        atexit.register(self.flush)
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.config_file).st_mtime_ns
+        except OSError:
+            return None
+
+    def _ensure_loaded(self):
+        """Carga la configuración la primera vez y la recarga sólo si el archivo cambió en
+        disco (y no hay cambios propios pendientes de guardar)"""
+        mtime = self._file_mtime()
+        if self._config is None or (not self._dirty and mtime != self._mtime):
+            self._config = self.load_config()
+            self._mtime = mtime
+
     def load_config(self):
         """Carga la configuración desde el archivo, o crea una por defecto"""
         try:
@@ -28,42 +71,168 @@ class ConfigManager:
             return self.default_config.copy()
     
     def save_config(self, config):
-        """Guarda la configuración en el archivo"""
-        try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            print(f"Error guardando configuración: {e}")
+        """Reemplaza la configuración completa y programa su guardado"""
+        with self._lock:
+            self._config = dict(config)
+            self._mark_dirty()
+
+    def _mark_dirty(self):
+        # Los cambios seguidos se agrupan en una sola escritura tras SAVE_DELAY segundos
+        self._dirty = True
+        if self._timer:
+            self._timer.cancel()
+        self._timer = threading.Timer(SAVE_DELAY, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def flush(self):
+        """Escribe los cambios pendientes de forma atómica (archivo temporal + renombrado)"""
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            # Un temporal propio: la interfaz, la CLI y el ajuste pueden guardar a la vez
+            temp_file = None
+            try:
+                fd, temp_file = tempfile.mkstemp(prefix=".config-", suffix=".tmp",
+                                                 dir=os.path.dirname(self.config_file))
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(self._config, f, indent=2, ensure_ascii=False)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_file, self.config_file)
+                self._mtime = self._file_mtime()
+                self._dirty = False
+            except Exception as e:
+                print(f"Error guardando configuración: {e}")
+                if temp_file and os.path.exists(temp_file):
+                    os.remove(temp_file)
+
+    def get(self, key):
+        with self._lock:
+            self._ensure_loaded()
+            return self._config.get(key, self.default_config.get(key))
+
+    def set(self, key, value):
+        with self._lock:
+            self._ensure_loaded()
+            if self._config.get(key) == value:
+                return
+            self._config[key] = value
+            self._mark_dirty()
     
     def get_dark_mode(self):
         """Obtiene la preferencia del tema oscuro"""
-        config = self.load_config()
-        return config.get("dark_mode", False)
+        return self.get("dark_mode")
     
     def set_dark_mode(self, dark_mode):
         """Guarda la preferencia del tema oscuro"""
-        config = self.load_config()
-        config["dark_mode"] = dark_mode
-        self.save_config(config)
+        self.set("dark_mode", dark_mode)
     
     def get_last_audio_directory(self):
         """Obtiene el último directorio usado para archivos de audio"""
-        config = self.load_config()
-        return config.get("last_audio_directory", "")
+        return self.get("last_audio_directory")
     
     def set_last_audio_directory(self, directory):
         """Guarda el último directorio usado para archivos de audio"""
-        config = self.load_config()
-        config["last_audio_directory"] = directory
-        self.save_config(config)
+        self.set("last_audio_directory", directory)
     
     def get_last_output_directory(self):
         """Obtiene el último directorio usado para guardar transcripciones"""
-        config = self.load_config()
-        return config.get("last_output_directory", "")
+        return self.get("last_output_directory")
     
     def set_last_output_directory(self, directory):
         """Guarda el último directorio usado para guardar transcripciones"""
-        config = self.load_config()
-        config["last_output_directory"] = directory
-        self.save_config(config)
+        self.set("last_output_directory", directory)
+
+    def get_model(self):
+        """Obtiene el modelo Whisper preferido"""
+        return self.get("model")
+
+    def set_model(self, model):
+        """Guarda el modelo Whisper preferido"""
+        self.set("model", model)
+
+    def get_backend(self):
+        """Obtiene el motor de inferencia preferido (fp32, int8...)"""
+        return self.get("backend")
+
+    def set_backend(self, backend):
+        """Guarda el motor de inferencia preferido (fp32, int8...)"""
+        self.set("backend", backend)
+
+    def get_threads(self):
+        """Obtiene los hilos de inferencia (0 = automático)"""
+        return self.get("threads")
+
+    def set_threads(self, threads):
+        """Guarda los hilos de inferencia (0 = automático)"""
+        self.set("threads", threads)
+
+    def get_batch_size(self):
+        """Obtiene los segmentos por lote de inferencia (0 = automático)"""
+        return self.get("batch_size")
+
+    def set_batch_size(self, batch_size):
+        """Guarda los segmentos por lote de inferencia (0 = automático)"""
+        self.set("batch_size", batch_size)
+
+    def get_model_memory_budget(self):
+        """Obtiene los MB que pueden ocupar los modelos cargados (0 = automático)"""
+        return self.get("model_memory_budget")
+
+    def set_model_memory_budget(self, megabytes):
+        """Guarda los MB que pueden ocupar los modelos cargados (0 = automático)"""
+        self.set("model_memory_budget", megabytes)
+
+    def get_workers(self):
+        """Obtiene los procesos para transcribir por lotes (0 = automático)"""
+        return self.get("workers")
+
+    def set_workers(self, workers):
+        """Guarda los procesos para transcribir por lotes (0 = automático)"""
+        self.set("workers", workers)
+
+    def get_live_latency(self):
+        """Obtiene la latencia objetivo del modo en vivo, en segundos"""
+        return self.get("live_latency")
+
+    def set_live_latency(self, latency):
+        """Guarda la latencia objetivo del modo en vivo, en segundos"""
+        self.set("live_latency", latency)
+
+    def get_tuned_profile(self, model):
+        """Obtiene el perfil de rendimiento medido para un modelo, o None si no existe"""
+        return self.get("tuned_profiles").get(model)
+
+    def set_tuned_profile(self, model, profile):
+        """Guarda el perfil de rendimiento medido para un modelo"""
+        profiles = dict(self.get("tuned_profiles"))
+        profiles[model] = profile
+        self.set("tuned_profiles", profiles)
+
+    def get_cache_directory(self):
+        """Obtiene el directorio de la caché de transcripciones ("" = por defecto)"""
+        return self.get("cache_directory")
+
+    def set_cache_directory(self, directory):
+        """Guarda el directorio de la caché de transcripciones ("" = por defecto)"""
+        self.set("cache_directory", directory)
+
+    def get_archive_directory(self):
+        """Obtiene el directorio del archivo de transcripciones ("" = por defecto)"""
+        return self.get("archive_directory")
+
+    def set_archive_directory(self, directory):
+        """Guarda el directorio del archivo de transcripciones ("" = por defecto)"""
+        self.set("archive_directory", directory)
+
+    def get_service_url(self):
+        """Obtiene la dirección del servicio de transcripción ("" = motor local)"""
+        return self.get("service_url")
+
+    def set_service_url(self, url):
+        """Guarda la dirección del servicio de transcripción ("" = motor local)"""
+        self.set("service_url", url)
@@ -0,0 +1,539 @@
+import json
+import os
+import queue
+import re
+import subprocess
+import threading
+import time
+from collections import namedtuple
+import numpy as np
+import torch
+import whisper
+from whisper.audio import SAMPLE_RATE, load_audio
+from archive import TranscriptArchive
+from cache import TranscriptionCache, content_hash, file_key, segment_key
+from jobs import JobControl
+from model_manager import DEFAULT_BACKEND, DEFAULT_MODEL, ModelManager
+from profiler import JobProfiler
+from utils import TranscriptJournal
+from vad import split_on_pauses
+from writers import WRITERS, writer_for_path
+
+SEGMENT_SECONDS = 30
+PREFETCH_SEGMENTS = 2  # Segmentos preparados por adelantado entre decodificación e inferencia
+MAX_BATCH_SIZE = 16
+BATCH_MEMORY_FRACTION = 0.25  # Fracción de la RAM libre que puede ocupar un lote
+TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+PROMPT_WORDS = 50  # Palabras del segmento anterior que se pasan como contexto
+TIME_PRECISION = 0.02  # Segundos por token de tiempo (dos tramas de 10 ms del encoder)
+
+OUTPUT_FORMATS = tuple(WRITERS)
+
+# Modelos compartidos por todos los trabajos del proceso (se cargan en el primer uso)
+model_manager = ModelManager()
+
+# Segmento de audio: índice, inicio y fin en segundos y vista NumPy de las muestras
+Segment = namedtuple("Segment", ["index", "start", "end", "audio"])
+
+def get_model(name=DEFAULT_MODEL, backend=DEFAULT_BACKEND):
+    """Devuelve el modelo Whisper pedido (con el motor de inferencia `backend`), cargándolo
+    la primera vez que se usa"""
+    return model_manager.get(name, backend)
+
+def split_audio(file_path):
+    """Decodifica el audio una sola vez (16 kHz, mono, float32) y lo divide en
+    vistas de 30 segundos sobre el mismo buffer, sin archivos temporales ni copias"""
+    audio = load_audio(file_path)
+    segment_samples = SEGMENT_SECONDS * SAMPLE_RATE
+    segments = []
+
+    for index, start in enumerate(range(0, len(audio), segment_samples)):
+        end = min(start + segment_samples, len(audio))
+        # El slicing de NumPy devuelve una vista, no una copia
+        segments.append(Segment(index, start / SAMPLE_RATE, end / SAMPLE_RATE, audio[start:end]))
+
+    return segments
+
+def probe_duration(file_path):
+    """Obtiene la duración del audio en segundos a partir de la cabecera que informa ffmpeg"""
+    result = subprocess.run(
+        ["ffmpeg", "-nostdin", "-hide_banner", "-i", file_path],
+        capture_output=True, text=True, errors="replace"
+    )
+    match = re.search(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)", result.stderr)
+    if not match:
+        return 0.0
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+def stream_audio(file_path, chunk_seconds=SEGMENT_SECONDS, start_time=0.0, start_index=0):
+    """Decodifica el audio en streaming desde una tubería de ffmpeg y produce segmentos
+    de tamaño fijo (16 kHz, mono, float32). La memoria máxima es la de un solo segmento,
+    independientemente de la duración del archivo. `start_time` y `start_index` permiten
+    reanudar a mitad de archivo sin decodificar lo ya procesado"""
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0",
+        "-ss", f"{start_time:.3f}",
+        "-i", file_path,
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE),
+        "-loglevel", "error", "-"
+    ]
+    chunk_bytes = chunk_seconds * SAMPLE_RATE * 2  # 2 bytes por muestra int16
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    try:
+        index = start_index
+        position = round(start_time * SAMPLE_RATE)
+        while True:
+            data = process.stdout.read(chunk_bytes)
+            if not data:
+                break
+            audio = np.frombuffer(data, np.int16).astype(np.float32) / 32768.0
+            start = position / SAMPLE_RATE
+            position += len(audio)
+            yield Segment(index, start, position / SAMPLE_RATE, audio)
+            index += 1
+
+        process.stdout.close()
+        if process.wait() != 0:
+            error = process.stderr.read().decode(errors="replace").strip()
+            raise RuntimeError(f"Error decodificando audio: {error}")
+    finally:
+        # Si el consumidor abandona el generador, no dejar ffmpeg huérfano
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stderr.close()
+
+def speech_segments(file_path, start_time=0.0, start_index=0, profiler=None):
+    """Segmenta el audio por actividad de voz: descarta el silencio y agrupa la voz en
+    ventanas de hasta 30 s que terminan en pausas, decodificando en streaming"""
+    blocks = stream_audio(file_path, start_time=start_time)
+    if profiler:
+        blocks = profiler.timed(blocks, "decode")
+    blocks = (segment.audio for segment in blocks)
+    first_sample = round(start_time * SAMPLE_RATE)
+    index = start_index
+    for start, audio in split_on_pauses(blocks, SEGMENT_SECONDS * SAMPLE_RATE):
+        start = first_sample + start
+        yield Segment(index, start / SAMPLE_RATE, (start + len(audio)) / SAMPLE_RATE, audio)
+        index += 1
+
+def prepare_segment(segment, n_mels):
+    """Calcula el espectrograma log-mel de un segmento, rellenado a la ventana de 30 s de Whisper"""
+    return whisper.log_mel_spectrogram(whisper.pad_or_trim(segment.audio), n_mels)
+
+def available_memory():
+    """Memoria física libre en bytes, o None si la plataforma no permite consultarla"""
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+def segment_memory(model):
+    """Bytes que ocupa cada segmento de un lote durante la inferencia"""
+    dims = model.dims
+    # Matrices de atención del encoder (cabezas x contexto²), activaciones del encoder y el
+    # propio log-mel, todo en float32
+    attention = dims.n_audio_head * dims.n_audio_ctx ** 2 * 4
+    activations = dims.n_audio_ctx * dims.n_audio_state * 4 * 8
+    mel = dims.n_mels * whisper.audio.N_FRAMES * 4
+    return attention + activations + mel
+
+def auto_batch_size(model):
+    """Estima cuántos segmentos caben en un lote según la RAM libre y el tamaño del modelo"""
+    free = available_memory()
+    if free is None:
+        return 1
+    return max(1, min(MAX_BATCH_SIZE, int(free * BATCH_MEMORY_FRACTION) // segment_memory(model)))
+
+def _is_silence(result):
+    return result.no_speech_prob > 0.6 and result.avg_logprob < -1.0
+
+def _needs_fallback(result):
+    return result.compression_ratio > 2.4 or result.avg_logprob < -1.0
+
+def timestamped_pieces(tokens, tokenizer, text=""):
+    """Divide los tokens de un resultado en frases [inicio, fin, texto] usando los tokens de
+    tiempo de Whisper, en segundos desde el inicio del segmento. Una frase sin token de
+    cierre llega hasta el final de la ventana de 30 s (el trabajo la recorta al segmento)"""
+    pieces = []
+    start = 0.0
+    pending = []
+    for token in tokens:
+        if token >= tokenizer.timestamp_begin:
+            seconds = (token - tokenizer.timestamp_begin) * TIME_PRECISION
+            if pending:
+                pieces.append([start, seconds, tokenizer.decode(pending).strip()])
+                pending = []
+            start = seconds
+        elif token < tokenizer.eot:
+            pending.append(token)
+    if pending:
+        pieces.append([start, float(SEGMENT_SECONDS), tokenizer.decode(pending).strip()])
+    pieces = [piece for piece in pieces if piece[2]]
+    if not pieces and text.strip():
+        pieces = [[0.0, float(SEGMENT_SECONDS), text.strip()]]
+    return pieces
+
+class DecodeSession:
+    """Contexto de decodificación compartido por todos los segmentos de un trabajo.
+    El idioma se detecta una sola vez (en el primer segmento con voz) o lo fija el usuario,
+    y la cola del texto anterior se pasa como prompt al siguiente segmento. Cada segmento
+    decodificado es un par (texto, frases con tiempos relativos al segmento)"""
+
+    def __init__(self, model, language=None, prompt=None):
+        self.model = model
+        self.language = language
+        self.prompt = prompt
+        self.accepted = []  # (idioma, temperatura) de cada resultado del último decode_batch
+        self.fp16 = model.device.type != "cpu"
+        self.tokenizer = whisper.tokenizer.get_tokenizer(model.is_multilingual, num_languages=model.num_languages)
+
+    def _options(self, temperature):
+        return whisper.DecodingOptions(
+            temperature=temperature, fp16=self.fp16, language=self.language, prompt=self.prompt,
+            without_timestamps=False
+        )
+
+    def _accept(self, result, temperature):
+        """Actualiza el contexto con un resultado aceptado y devuelve (texto, frases)"""
+        if _is_silence(result):
+            self.accepted.append((None, 0.0))
+            return "", []
+        self.accepted.append((result.language, temperature))
+        self.update_context(result.text, result.language, temperature)
+        return result.text, timestamped_pieces(result.tokens, self.tokenizer, result.text)
+
+    def update_context(self, text, language, temperature=0.0):
+        """Fija el idioma y el prompt con un segmento aceptado, decodificado ahora o leído de
+        la caché (donde `language` es None si era silencio)"""
+        if self.language is None and language:
+            # Primer segmento con voz: el idioma queda fijado para el resto del trabajo
+            self.language = language
+        # Igual que whisper.transcribe: no arrastrar el contexto de un resultado inestable
+        if temperature > 0.5:
+            self.prompt = None
+        elif text.strip():
+            self.prompt = " ".join(text.split()[-PROMPT_WORDS:])
+
+    def decode_segment(self, mel, temperatures=TEMPERATURES):
+        """Decodifica un espectrograma, reintentando con temperaturas más altas si el
+        resultado parece degenerado (mismo criterio que whisper.transcribe)"""
+        for temperature in temperatures:
+            result = self.model.decode(mel.to(self.model.device), self._options(temperature))
+            if _is_silence(result) or not _needs_fallback(result):
+                break
+        return self._accept(result, temperature)
+
+    def decode_batch(self, mels):
+        """Decodifica varios espectrogramas en una sola pasada de encoder/decoder. Todo el lote
+        comparte el prompt del último segmento anterior; los resultados degenerados se
+        reintentan individualmente con temperatura. `accepted` queda con el idioma y la
+        temperatura de cada resultado"""
+        self.accepted = []
+        if len(mels) == 1:
+            return [self.decode_segment(mels[0])]
+
+        results = self.model.decode(torch.stack(mels).to(self.model.device), self._options(0.0))
+
+        decoded = []
+        for mel, result in zip(mels, results):
+            if not _is_silence(result) and _needs_fallback(result):
+                decoded.append(self.decode_segment(mel, TEMPERATURES[1:]))
+            else:
+                decoded.append(self._accept(result, 0.0))
+        return decoded
+
+def batched(iterable, size):
+    """Agrupa los elementos de un iterable en listas de hasta `size` elementos"""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class SegmentPrefetcher:
+    """Etapa productora del pipeline: en un hilo aparte decodifica el audio y calcula el
+    log-mel del segmento N+1 mientras el modelo procesa el segmento N. La cola acotada
+    aplica contrapresión, así que nunca hay más de `depth` segmentos preparados en memoria"""
+
+    _END = object()
+
+    def __init__(self, segments, n_mels, depth=PREFETCH_SEGMENTS, profiler=None):
+        self.segments = segments  # Iterable perezoso: se consume (y decodifica) en el hilo productor
+        self.n_mels = n_mels
+        self.profiler = profiler
+        self.queue = queue.Queue(maxsize=depth)
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._produce, daemon=True)
+
+    def _put(self, item):
+        # Espera con timeout para poder abandonar si el consumidor se detiene
+        while not self.stop_event.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self):
+        try:
+            for segment in self.segments:
+                if self.profiler:
+                    with self.profiler.stage("mel"):
+                        mel = prepare_segment(segment, self.n_mels)
+                else:
+                    mel = prepare_segment(segment, self.n_mels)
+                if not self._put((segment, mel)):
+                    return
+            self._put(self._END)
+        except Exception as e:
+            self._put(e)
+
+    def __iter__(self):
+        self.thread.start()
+        try:
+            while True:
+                item = self.queue.get()
+                if item is self._END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            self.close()
+
+    def close(self):
+        """Detiene el hilo productor y descarta los segmentos ya preparados"""
+        self.stop_event.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        # Cerrar el generador de segmentos termina también el proceso ffmpeg que lo alimenta
+        self.segments.close()
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+def absolute_pieces(segment, pieces):
+    """Pasa las frases de un segmento a tiempos del audio original, sumando el inicio del
+    segmento y recortando al final del segmento"""
+    return [[round(segment.start + min(start, segment.end - segment.start), 3),
+             round(segment.start + min(end, segment.end - segment.start), 3), text]
+            for start, end, text in pieces]
+
+def decode_signature(model_name, use_vad=True, language=None, backend=DEFAULT_BACKEND):
+    """Describe el modelo y las opciones de decodificación; forma parte de las claves de caché"""
+    segmentation = "vad" if use_vad else "fixed"
+    return (f"{ModelManager.key(model_name, backend)}|{SAMPLE_RATE}Hz|{SEGMENT_SECONDS}s|{segmentation}|{language or 'auto'}"
+            f"|t={','.join(map(str, TEMPERATURES))}|timestamps")
+
+def journal_identity(file_path, signature):
+    """Identifica el audio (ruta, tamaño y fecha) y las opciones con las que se creó un diario"""
+    stat = os.stat(file_path)
+    return f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}|{signature}"
+
+class TranscriptionJob:
+    """Transcripción de un archivo completo: consulta la caché, reanuda desde el diario si
+    hubo una interrupción, decodifica por lotes y escribe cada segmento en cuanto termina
+    con el formato que indica la extensión de `output_path` (txt, srt, vtt, jsonl).
+    `progress_callback`, si se indica, recibe el porcentaje tras cada segmento,
+    `segment_callback` cada entrada del diario en cuanto se escribe y `control` (un
+    JobControl) permite pausar o cancelar el trabajo entre lotes. Con `use_archive`, cada
+    frase se indexa en el archivo de transcripciones (archive.py) según se escribe"""
+
+    def __init__(self, file_path, output_path="Transcripcion.txt", batch_size=None, progress_callback=None,
+                 model_name=DEFAULT_MODEL, use_cache=True, use_vad=True, language=None, stats_callback=None,
+                 profile_log=None, cache_directory=None, control=None, backend=DEFAULT_BACKEND,
+                 segment_callback=None, use_archive=True, archive_directory=None):
+        self.file_path = file_path
+        self.output_path = output_path
+        self.batch_size = batch_size
+        self.progress_callback = progress_callback
+        self.segment_callback = segment_callback
+        self.model_name = model_name
+        self.backend = backend  # Motor de inferencia (backends.py): fp32, int8...
+        self.use_cache = use_cache
+        self.cache_directory = cache_directory  # None: directorio de caché del usuario
+        self.use_vad = use_vad
+        self.language = language  # None: detectar en el primer segmento con voz
+        self.signature = decode_signature(model_name, use_vad, language, backend)
+        self.cache = None
+        self.use_archive = use_archive
+        self.archive_directory = archive_directory  # None: directorio de datos del usuario
+        self.archive = None
+        self.archive_id = None
+        self.duration = 0.0
+        # Instrumentación: estadísticas en vivo para `stats_callback` y log JSON-lines opcional
+        self.profiler = JobProfiler(file_path, profile_log, stats_callback)
+        self.summary = None
+        self.control = control or JobControl()
+
+    def _report(self, position):
+        """Informa el progreso según el segundo de audio alcanzado"""
+        if self.progress_callback:
+            percent = int(position * 100 // self.duration) if self.duration else 100
+            self.progress_callback(min(100, percent))
+
+    def _emit(self, writer, entry):
+        """Escribe una entrada en la salida y la pasa a `segment_callback`"""
+        writer.write(entry)
+        if self.archive:
+            self.archive.add_entry(self.archive_id, entry)
+        if self.segment_callback:
+            self.segment_callback(entry)
+
+    def segments(self, start_time=0.0, start_index=0):
+        if self.use_vad:
+            segments = speech_segments(self.file_path, start_time, start_index, self.profiler)
+            return self.profiler.timed(segments, "segmentation")
+        segments = stream_audio(self.file_path, start_time=start_time, start_index=start_index)
+        return self.profiler.timed(segments, "decode")
+
+    def run(self):
+        self.cache = TranscriptionCache(self.cache_directory) if self.use_cache else None
+        self.archive = TranscriptArchive(self.archive_directory) if self.use_archive else None
+        try:
+            self._run()
+        finally:
+            if self.cache:
+                self.cache.close()
+            if self.archive:
+                self.archive.close()
+            self.summary = self.profiler.finish()
+
+    def _run(self):
+        # El hash del contenido identifica el audio en la caché y en el archivo
+        content = content_hash(self.file_path) if self.cache or self.archive else None
+        if self.archive:
+            with self.profiler.stage("archive"):
+                self.archive_id = self.archive.begin(content, self.file_path, self.output_path,
+                                                     ModelManager.key(self.model_name, self.backend), self.language)
+
+        # Archivo idéntico ya transcrito: ni siquiera hace falta decodificarlo
+        whole_key = file_key(self.file_path, self.signature, content) if self.cache else None
+        if self.cache:
+            cached = self.cache.get(whole_key)
+            if cached is not None:
+                writer = writer_for_path(self.output_path)
+                for line in cached.splitlines():
+                    self._emit(writer, json.loads(line))
+                writer.close()
+                if self.archive:
+                    self.archive.finish(self.archive_id)
+                self._report(self.duration)
+                return
+
+        with self.profiler.stage("model_load"):
+            model = get_model(self.model_name, self.backend)
+        with self.profiler.stage("probe"):
+            self.duration = probe_duration(self.file_path)
+
+        # Cada segmento terminado se registra en el diario; si una ejecución anterior se
+        # interrumpió con el mismo audio y opciones, se reanuda tras el último segmento completo
+        journal = TranscriptJournal(self.output_path, journal_identity(self.file_path, self.signature))
+        last_entry = journal.open()
+        resume_index, resume_time = (last_entry["index"] + 1, last_entry["end"]) if last_entry else (0, 0.0)
+        if last_entry:
+            self._report(resume_time)
+        self.profiler.start(self.duration, resume_time)
+
+        # Al reanudar se recupera el idioma y el contexto de la ejecución interrumpida
+        session = DecodeSession(
+            model,
+            self.language or (last_entry or {}).get("language"),
+            " ".join(last_entry["text"].split()[-PROMPT_WORDS:]) if last_entry else None
+        )
+
+        batch_size = self.batch_size or auto_batch_size(model)
+
+        # La salida se escribe en streaming: al reanudar se reescribe desde el diario (entrada
+        # a entrada, sin cargarlo en memoria) y se sigue añadiendo segmento a segmento
+        with self.profiler.stage("write"):
+            writer = writer_for_path(self.output_path)
+            if last_entry:
+                for entry in journal.entries():
+                    self._emit(writer, entry)
+
+        # El prefetch debe cubrir al menos un lote para que la decodificación no se detenga
+        prefetcher = SegmentPrefetcher(self.segments(resume_time, resume_index), model.dims.n_mels,
+                                       max(PREFETCH_SEGMENTS, batch_size), self.profiler)
+        try:
+            for batch in batched(self.profiler.timed(prefetcher, "wait"), batch_size):
+                with self.profiler.stage("paused"):
+                    self.control.checkpoint()
+                batch_start = time.perf_counter()
+                decoded = self._decode_batch(session, batch)
+                # Los resultados conservan el orden de los segmentos dentro del lote
+                for (segment, _), (text, pieces) in zip(batch, decoded):
+                    with self.profiler.stage("write"):
+                        entry = journal.append(segment, text, session.language, absolute_pieces(segment, pieces))
+                        self._emit(writer, entry)
+                    self.profiler.segment_done(segment, time.perf_counter() - batch_start)
+                    self._report(segment.end)
+        finally:
+            # Al cancelar se liberan en el acto el hilo productor y sus buffers de audio
+            prefetcher.close()
+            journal.close()
+            writer.close()
+
+        if self.cache:
+            with self.profiler.stage("cache"):
+                self.cache.put(whole_key, "".join(json.dumps(entry, ensure_ascii=False) + "\n"
+                                                  for entry in journal.entries()))
+        if self.archive:
+            with self.profiler.stage("archive"):
+                self.archive.finish(self.archive_id, session.language)
+        with self.profiler.stage("cleanup"):
+            journal.remove()
+        self._report(self.duration)
+
+    def _decode_batch(self, session, batch):
+        """Devuelve (texto, frases relativas al segmento) para cada segmento del lote"""
+        decoded = [None] * len(batch)
+        keys = [None] * len(batch)
+        hits = {}  # índice -> entrada de la caché
+        if self.cache:
+            with self.profiler.stage("cache"):
+                for i, (segment, _) in enumerate(batch):
+                    keys[i] = segment_key(segment.audio, self.signature)
+                    cached = self.cache.get(keys[i])
+                    if cached is not None:
+                        hits[i] = json.loads(cached)
+                        decoded[i] = hits[i]["text"], hits[i]["pieces"]
+
+        def accept_hits(indices):
+            # Los segmentos de la caché actualizan el idioma y el prompt igual que los decodificados
+            for i in indices:
+                session.update_context(hits[i]["text"], hits[i].get("language"), hits[i].get("temperature", 0.0))
+
+        # Sólo los segmentos que no están en caché pasan por el modelo
+        pending = [i for i, result in enumerate(decoded) if result is None]
+        accept_hits(sorted(hits))
+        if pending:
+            with self.profiler.stage("inference"):
+                results = session.decode_batch([batch[i][1] for i in pending])
+            # El prompt del lote siguiente sale del último segmento, venga o no de la caché
+            accept_hits([i for i in sorted(hits) if i > pending[-1]])
+            with self.profiler.stage("cache"):
+                for i, (text, pieces), (language, temperature) in zip(pending, results, session.accepted):
+                    decoded[i] = text, pieces
+                    if self.cache:
+                        self.cache.put(keys[i], json.dumps({"text": text, "pieces": pieces, "language": language,
+                                                            "temperature": temperature}, ensure_ascii=False))
+        return decoded
+
+def transcribe_file(file_path, output_path="Transcripcion.txt", batch_size=None, progress_callback=None,
+                    model_name=DEFAULT_MODEL, use_cache=True, use_vad=True, language=None, stats_callback=None,
+                    profile_log=None, cache_directory=None, control=None, backend=DEFAULT_BACKEND,
+                    segment_callback=None, use_archive=True, archive_directory=None):
+    """Transcribe un archivo completo y escribe el resultado en `output_path`.
+    Devuelve el resumen de instrumentación del trabajo; lanza JobCancelled si `control` lo cancela"""
+    job = TranscriptionJob(file_path, output_path, batch_size, progress_callback, model_name, use_cache, use_vad,
+                           language, stats_callback, profile_log, cache_directory, control, backend,
+                           segment_callback, use_archive, archive_directory)
+    job.run()
+    return job.summary
@@ -0,0 +1,135 @@
+import heapq
+import itertools
+import threading
+
+class JobCancelled(Exception):
+    """El trabajo se canceló antes de terminar; el diario se conserva para poder reanudarlo"""
+
+class JobControl:
+    """Cancelación y pausa cooperativas: el trabajo las consulta entre lotes de segmentos,
+    así que nunca se interrumpe a mitad de una inferencia ni deja el diario a medias"""
+
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._running.set()  # Un trabajo en pausa debe despertar para terminar
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def checkpoint(self):
+        """Bloquea mientras el trabajo esté en pausa y lanza JobCancelled si se canceló"""
+        self._running.wait()
+        if self._cancelled.is_set():
+            raise JobCancelled()
+
+# Estados de un trabajo en la cola
+JOB_QUEUED = "En cola"
+JOB_RUNNING = "Transcribiendo"
+JOB_PAUSED = "En pausa"
+JOB_DONE = "Completado"
+JOB_CANCELLED = "Cancelado"
+JOB_FAILED = "Error"
+
+# Prioridades: el número menor se atiende antes
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+class QueuedJob:
+    """Un archivo en la cola de transcripción con su estado y progreso"""
+
+    def __init__(self, job_id, file_path, output_path, priority, job_options):
+        self.id = job_id
+        self.file_path = file_path
+        self.output_path = output_path
+        self.priority = priority
+        self.job_options = job_options
+        self.state = JOB_QUEUED
+        self.progress = 0
+        self.error = None
+        self.control = JobControl()
+
+    @property
+    def active(self):
+        return self.state in (JOB_RUNNING, JOB_PAUSED)
+
+    @property
+    def paused(self):
+        return self.state == JOB_PAUSED
+
+    @property
+    def completed(self):
+        return self.state == JOB_DONE
+
+    @property
+    def finished(self):
+        return self.state in (JOB_DONE, JOB_CANCELLED, JOB_FAILED)
+
+    def status(self):
+        return {"id": self.id, "file": self.file_path, "output": self.output_path, "priority": self.priority,
+                "state": self.state, "progress": self.progress, "error": self.error}
+
+class JobQueue:
+    """Trabajos pendientes por prioridad y, a igual prioridad, por orden de llegada. No
+    ejecuta nada: la cola de la interfaz (Qt) y el servicio local deciden cuándo sacar el
+    siguiente"""
+
+    def __init__(self):
+        self.jobs = {}
+        self._pending = []  # Montículo de (prioridad, orden, id)
+        self._order = itertools.count()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add(self, file_path, output_path, priority=PRIORITY_NORMAL, **job_options):
+        with self._lock:
+            job = QueuedJob(next(self._ids), file_path, output_path, priority, job_options)
+            self.jobs[job.id] = job
+            heapq.heappush(self._pending, (priority, next(self._order), job.id))
+            return job
+
+    def set_priority(self, job_id, priority):
+        """Cambia la prioridad de un trabajo que aún espera; devuelve si hubo cambio"""
+        with self._lock:
+            job = self.jobs[job_id]
+            if job.state != JOB_QUEUED or job.priority == priority:
+                return False
+            job.priority = priority
+            # La entrada anterior queda obsoleta y se descarta al sacarla del montículo
+            heapq.heappush(self._pending, (priority, next(self._order), job.id))
+            return True
+
+    def pop(self):
+        """Saca el siguiente trabajo en espera, o None si no hay ninguno"""
+        with self._lock:
+            while self._pending:
+                priority, _, job_id = heapq.heappop(self._pending)
+                job = self.jobs.get(job_id)
+                if job and job.state == JOB_QUEUED and job.priority == priority:
+                    return job
+            return None
+
+    def remove(self, job_id):
+        """Olvida un trabajo terminado (sus entradas en el montículo se descartan al sacarlas)"""
+        with self._lock:
+            return self.jobs.pop(job_id, None)
+
+    def waiting(self):
+        """Trabajos que siguen en espera"""
+        return [job for job in list(self.jobs.values()) if job.state == JOB_QUEUED]
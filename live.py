@@ -0,0 +1,420 @@
+import argparse
+import os
+import queue
+import re
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+from whisper.audio import SAMPLE_RATE, load_audio
+
+from engine import (OUTPUT_FORMATS, SEGMENT_SECONDS, DecodeSession, Segment, absolute_pieces, get_model,
+                    prepare_segment)
+from model_manager import DEFAULT_BACKEND, DEFAULT_MODEL, MODEL_SIZES
+from profiler import percentile
+from writers import writer_for_path
+
+DEFAULT_LATENCY = 2.0   # Segundos objetivo entre que se oye una palabra y se confirma
+MIN_STEP = 0.3          # Audio nuevo mínimo entre dos decodificaciones
+READ_SECONDS = 0.1      # Bloques que se leen de ffmpeg
+TRIM_SECONDS = 15.0     # A partir de esta duración, la ventana se recorta tras lo confirmado
+MAX_WINDOW = SEGMENT_SECONDS - 5  # Nunca se decodifica más que esto (Whisper ve 30 s)
+SILENCE_SECONDS = 5.0   # Ventana sin voz reconocida a partir de la cual se descarta...
+SILENCE_KEEP = 1.0      # ...salvo este final, por si contiene el inicio de una palabra
+IDLE_TIMEOUT = 5.0      # Un archivo que deja de crecer este tiempo se da por terminado
+POLL_SECONDS = 0.05     # Espera entre lecturas de un archivo que aún crece
+OVERLAP_WORDS = 5       # Palabras ya confirmadas que Whisper puede repetir al inicio de la ventana
+PERCENTILES = (("p50", 0.5), ("p90", 0.9), ("p95", 0.95), ("p99", 0.99), ("max", 1.0))
+
+# Palabra con tiempos absolutos en segundos desde el inicio del audio
+Word = namedtuple("Word", ["start", "end", "text"])
+
+def follow_file(file_path, stop_event=None, idle_timeout=IDLE_TIMEOUT):
+    """Lee un archivo que todavía se está grabando, como `tail -f`: produce los bytes nuevos
+    a medida que aparecen y termina cuando deja de crecer durante `idle_timeout` segundos"""
+    with open(file_path, "rb") as file:
+        last_growth = time.monotonic()
+        while not (stop_event and stop_event.is_set()):
+            data = file.read(65536)
+            if data:
+                last_growth = time.monotonic()
+                yield data
+            elif time.monotonic() - last_growth > idle_timeout:
+                return
+            else:
+                time.sleep(POLL_SECONDS)
+
+def read_stdin():
+    """Bytes de la entrada estándar según llegan (audio por tubería)"""
+    stream = sys.stdin.buffer
+    while True:
+        data = stream.read1(65536)
+        if not data:
+            return
+        yield data
+
+def decode_stream(chunks, block_seconds=READ_SECONDS):
+    """Decodifica con ffmpeg un flujo de bytes de audio (cualquier formato que admita lectura
+    en streaming: wav, mp3, ogg, flac...) y produce bloques float32 de 16 kHz en cuanto salen.
+    A diferencia de stream_audio, la entrada llega por la tubería, no desde una ruta"""
+    cmd = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        # Sin análisis largo de la entrada: el primer audio sale en cuanto hay cabecera
+        "-probesize", "32768", "-analyzeduration", "0", "-fflags", "nobuffer",
+        "-i", "pipe:0",
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE),
+        "-flush_packets", "1", "pipe:1"
+    ]
+    process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def feed():
+        try:
+            for chunk in chunks:
+                process.stdin.write(chunk)
+                process.stdin.flush()
+        except (BrokenPipeError, OSError):
+            pass  # ffmpeg terminó antes (error de formato o el consumidor se detuvo)
+        finally:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+
+    feeder = threading.Thread(target=feed, daemon=True)
+    feeder.start()
+    block_bytes = int(block_seconds * SAMPLE_RATE) * 2
+    remainder = b""
+    try:
+        while True:
+            # read1 devuelve lo que ya está disponible sin esperar a llenar el bloque
+            data = process.stdout.read1(block_bytes)
+            if not data:
+                break
+            data = remainder + data
+            usable = len(data) - len(data) % 2
+            remainder = data[usable:]
+            if usable:
+                yield np.frombuffer(data[:usable], np.int16).astype(np.float32) / 32768.0
+        if process.wait() != 0:
+            error = process.stderr.read().decode(errors="replace").strip()
+            raise RuntimeError(f"Error decodificando audio: {error}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+def piece_words(pieces):
+    """Reparte cada frase [inicio, fin, texto] entre sus palabras en proporción a su longitud
+    (Whisper sólo da tiempos por frase)"""
+    words = []
+    for start, end, text in pieces:
+        tokens = text.split()
+        total = sum(len(token) for token in tokens) or 1
+        position = start
+        for token in tokens:
+            duration = (end - start) * len(token) / total
+            words.append(Word(round(position, 3), round(position + duration, 3), token))
+            position += duration
+    return words
+
+def _normalize(word):
+    return re.sub(r"[^\w]", "", word.lower())
+
+def agreed_prefix(previous, current):
+    """Número de palabras iniciales en las que coinciden dos hipótesis (sin mayúsculas ni puntuación)"""
+    count = 0
+    for old, new in zip(previous, current):
+        if _normalize(old.text) != _normalize(new.text):
+            break
+        count += 1
+    return count
+
+def words_text(words):
+    return " ".join(word.text for word in words)
+
+class LiveTranscriber:
+    """Transcripción incremental de un flujo de audio con ventanas solapadas. Cada vez que
+    llega audio nuevo suficiente se decodifica de nuevo toda la ventana pendiente (lo que
+    aún no está confirmado); las palabras en las que coinciden dos decodificaciones seguidas
+    se confirman y el resto se muestra como texto provisional. La ventana se recorta tras lo
+    confirmado, así que nunca supera MAX_WINDOW segundos.
+
+    `latency` es el objetivo en segundos: se decodifica cada latency / 2 de audio nuevo, de
+    modo que una palabra se confirma tras dos ventanas si la inferencia va a tiempo real.
+    `update_callback(confirmadas, provisionales)` recibe tras cada decodificación las
+    palabras recién confirmadas y la hipótesis provisional actual (listas de Word)"""
+
+    def __init__(self, model, language=None, latency=DEFAULT_LATENCY, update_callback=None):
+        self.model = model
+        self.session = DecodeSession(model, language)
+        self.step = max(MIN_STEP, latency / 2)
+        self.update_callback = update_callback
+        self.buffer = np.zeros(0, np.float32)
+        self.buffer_start = 0.0   # Segundo del audio en que empieza la ventana
+        self.new_samples = 0      # Muestras llegadas desde la última decodificación
+        self.committed = []
+        self.committed_time = 0.0
+        self.hypothesis = []
+        self.decode_seconds = 0.0
+        self.index = 0
+
+    @property
+    def audio_seconds(self):
+        return self.buffer_start + len(self.buffer) / SAMPLE_RATE
+
+    @property
+    def language(self):
+        return self.session.language
+
+    def feed(self, audio):
+        """Añade audio a la ventana y decodifica si ya hay `step` segundos nuevos"""
+        self.buffer = np.concatenate([self.buffer, audio])
+        self.new_samples += len(audio)
+        if self.new_samples >= self.step * SAMPLE_RATE:
+            self._update(final=False)
+
+    def finish(self):
+        """Fin del audio: decodifica lo que queda y confirma toda la hipótesis"""
+        if len(self.buffer):
+            self._update(final=True)
+        return self.committed
+
+    def _decode(self):
+        """Palabras de la ventana actual con tiempos absolutos"""
+        segment = Segment(self.index, self.buffer_start, self.audio_seconds, self.buffer)
+        # El contexto es el texto ya confirmado, nunca el provisional
+        self.session.prompt = words_text(self.committed[-50:]) or None
+        start = time.perf_counter()
+        _, pieces = self.session.decode_segment(prepare_segment(segment, self.model.dims.n_mels), (0.0,))
+        self.decode_seconds += time.perf_counter() - start
+        self.index += 1
+        return piece_words(absolute_pieces(segment, pieces))
+
+    def _update(self, final):
+        self.new_samples = 0
+        # Lo anterior a la última palabra confirmada ya se emitió
+        words = [word for word in self._decode() if word.end > self.committed_time + 0.05]
+        words = self._drop_repeated(words)
+
+        if final:
+            agreed = len(words)
+        else:
+            agreed = agreed_prefix(self.hypothesis, words)
+        confirmed, self.hypothesis = words[:agreed], words[agreed:]
+
+        window = len(self.buffer) / SAMPLE_RATE
+        if not final and not confirmed and window > MAX_WINDOW:
+            # Sin acuerdo en una ventana casi llena: se confirma la hipótesis para no perder audio
+            confirmed, self.hypothesis = words, []
+
+        if confirmed:
+            self.committed.extend(confirmed)
+            self.committed_time = max(self.committed_time, confirmed[-1].end)
+        self._trim(window)
+        if self.update_callback:
+            self.update_callback(confirmed, list(self.hypothesis))
+
+    def _drop_repeated(self, words):
+        """Whisper puede repetir al principio de la ventana las últimas palabras confirmadas"""
+        if not self.committed or not words or words[0].start - self.committed_time > 1.0:
+            return words
+        tail = [_normalize(word.text) for word in self.committed[-OVERLAP_WORDS:]]
+        head = [_normalize(word.text) for word in words[:OVERLAP_WORDS]]
+        for size in range(min(len(tail), len(head)), 0, -1):
+            if tail[-size:] == head[:size]:
+                return words[size:]
+        return words
+
+    def _trim(self, window):
+        """Descarta de la ventana el audio ya confirmado cuando se hace larga, y el silencio"""
+        if self.committed_time > self.buffer_start and window > TRIM_SECONDS:
+            cut = self.committed_time
+        elif not self.hypothesis and window > SILENCE_SECONDS:
+            cut = max(self.committed_time, self.audio_seconds - SILENCE_KEEP)
+        else:
+            return
+        samples = min(len(self.buffer), int((cut - self.buffer_start) * SAMPLE_RATE))
+        self.buffer = self.buffer[samples:].copy()
+        self.buffer_start += samples / SAMPLE_RATE
+
+def live_source(source, stop_event=None, idle_timeout=IDLE_TIMEOUT):
+    """Bytes de audio de un archivo que crece, o de la entrada estándar si `source` es "-" """
+    if source == "-":
+        return read_stdin()
+    return follow_file(source, stop_event, idle_timeout)
+
+def transcribe_live(source, model_name=DEFAULT_MODEL, backend=DEFAULT_BACKEND, language=None,
+                    latency=DEFAULT_LATENCY, update_callback=None, output_path=None, stop_event=None,
+                    idle_timeout=IDLE_TIMEOUT):
+    """Transcribe en vivo `source` (archivo que se está grabando o "-" para stdin) hasta que
+    termina o se activa `stop_event`. El texto confirmado se escribe en `output_path` (txt,
+    srt, vtt o jsonl) en cuanto se confirma. Devuelve el LiveTranscriber con el resultado"""
+    model = get_model(model_name, backend)
+    writer = writer_for_path(output_path) if output_path else None
+
+    def on_update(confirmed, partial):
+        if writer and confirmed:
+            writer.write({"index": transcriber.index, "start": confirmed[0].start, "end": confirmed[-1].end,
+                          "text": words_text(confirmed), "language": transcriber.language,
+                          "pieces": [[confirmed[0].start, confirmed[-1].end, words_text(confirmed)]]})
+        if update_callback:
+            update_callback(confirmed, partial)
+
+    transcriber = LiveTranscriber(model, language, latency, on_update)
+
+    # Un hilo lee el audio mientras el modelo decodifica: al terminar cada decodificación se
+    # toma de una vez todo lo que llegó entretanto
+    blocks = queue.Queue()
+
+    def read():
+        try:
+            for block in decode_stream(live_source(source, stop_event, idle_timeout)):
+                blocks.put(block)
+        except Exception as e:
+            blocks.put(e)
+        blocks.put(None)
+
+    threading.Thread(target=read, daemon=True).start()
+    try:
+        ended = False
+        while not ended:
+            pending = [blocks.get()]
+            while True:
+                try:
+                    pending.append(blocks.get_nowait())
+                except queue.Empty:
+                    break
+            for item in pending:
+                if isinstance(item, Exception):
+                    raise item
+            ended = pending[-1] is None or bool(stop_event and stop_event.is_set())
+            audio = [item for item in pending if item is not None]
+            if audio:
+                transcriber.feed(np.concatenate(audio))
+        transcriber.finish()
+    finally:
+        if writer:
+            writer.close()
+    return transcriber
+
+def write_streaming_wav_header(file):
+    """Cabecera WAV (16 kHz, mono, 16 bits) de longitud desconocida, como la de una grabación en curso"""
+    file.write(b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE")
+    file.write(b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, SAMPLE_RATE, SAMPLE_RATE * 2, 2, 16))
+    file.write(b"data" + struct.pack("<I", 0xFFFFFFFF))
+
+def replay(audio_path, model_name=DEFAULT_MODEL, backend=DEFAULT_BACKEND, language=None,
+           latency=DEFAULT_LATENCY, speed=1.0, log=print):
+    """Banco de pruebas del modo en vivo: reproduce un audio a velocidad real (o `speed` veces
+    más rápido) escribiéndolo poco a poco en un WAV que crece, lo transcribe en vivo y mide
+    la latencia de extremo a extremo de cada palabra: desde que su audio se escribe hasta que
+    aparece como provisional y hasta que se confirma"""
+    audio = (load_audio(audio_path) * 32767).astype(np.int16)
+    get_model(model_name, backend)  # La carga del modelo no cuenta como latencia
+    final_latencies = []
+    partial_latencies = []
+    shown = 0.0
+    clock = {}
+
+    def written_at(seconds):
+        """Momento en que el audio del segundo `seconds` quedó escrito en el archivo"""
+        return clock["start"] + seconds / speed
+
+    def on_update(confirmed, partial):
+        nonlocal shown
+        now = time.perf_counter()
+        for word in confirmed:
+            final_latencies.append(now - written_at(word.end))
+        for word in confirmed + partial:
+            if word.end > shown:
+                partial_latencies.append(now - written_at(word.end))
+                shown = word.end
+        if confirmed:
+            log(words_text(confirmed))
+
+    with tempfile.TemporaryDirectory() as directory:
+        growing_path = os.path.join(directory, "grabacion.wav")
+        with open(growing_path, "wb") as file:
+            write_streaming_wav_header(file)
+
+        def record():
+            chunk = int(READ_SECONDS * SAMPLE_RATE)
+            with open(growing_path, "ab") as file:
+                clock["start"] = time.perf_counter()
+                for start in range(0, len(audio), chunk):
+                    # Espera hasta el instante en que este bloque se habría grabado
+                    delay = clock["start"] + start / SAMPLE_RATE / speed - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    file.write(audio[start:start + chunk].tobytes())
+                    file.flush()
+
+        recorder = threading.Thread(target=record, daemon=True)
+        recorder.start()
+        while "start" not in clock:
+            time.sleep(0.001)
+        transcriber = transcribe_live(growing_path, model_name, backend, language, latency, on_update,
+                                      idle_timeout=max(1.0, 2 * READ_SECONDS / speed + 0.5))
+        recorder.join()
+
+    duration = len(audio) / SAMPLE_RATE
+    return {
+        "audio_seconds": duration,
+        "words": len(transcriber.committed),
+        "decode_rtf": transcriber.decode_seconds / duration if duration else None,
+        "latency_target": latency,
+        "partial": {name: percentile(partial_latencies, fraction) for name, fraction in PERCENTILES},
+        "final": {name: percentile(final_latencies, fraction) for name, fraction in PERCENTILES},
+        "text": words_text(transcriber.committed),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m live",
+                                     description="Transcripción en vivo de un archivo que se está grabando o de stdin")
+    parser.add_argument("source", help='Archivo que crece, "-" para la entrada estándar, o el audio a reproducir con --replay')
+    parser.add_argument("-o", "--output", help="Archivo donde ir guardando el texto confirmado (txt, srt, vtt, jsonl)")
+    parser.add_argument("-m", "--model", choices=MODEL_SIZES, default="base", help="Tamaño del modelo Whisper")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, help="Motor de inferencia (fp32, int8)")
+    parser.add_argument("-l", "--language", help="Código de idioma; fijarlo evita esperar a la detección")
+    parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY,
+                        help="Latencia objetivo en segundos hasta confirmar el texto")
+    parser.add_argument("--replay", action="store_true",
+                        help="Reproducir `source` a velocidad real y medir la latencia de extremo a extremo")
+    parser.add_argument("--speed", type=float, default=1.0, help="Velocidad de reproducción con --replay")
+    args = parser.parse_args(argv)
+
+    if args.output and os.path.splitext(args.output)[1].lower().lstrip(".") not in OUTPUT_FORMATS:
+        parser.error("El archivo de salida debe ser .txt, .srt, .vtt o .jsonl")
+
+    if args.replay:
+        results = replay(args.source, args.model, args.backend, args.language, args.latency, args.speed,
+                         log=lambda text: print(text, file=sys.stderr))
+        print(f"Audio: {results['audio_seconds']:.1f} s, {results['words']} palabras, "
+              f"inferencia {results['decode_rtf']:.2f}x tiempo real")
+        for kind, label in (("partial", "Provisional"), ("final", "Confirmado")):
+            values = results[kind]
+            if values["p50"] is None:
+                print(f"{label}: sin palabras")
+                continue
+            print(f"{label}: " + "  ".join(f"{name} {value:.2f} s" for name, value in values.items()))
+        return 0
+
+    def on_update(confirmed, partial):
+        if confirmed:
+            print(words_text(confirmed), flush=True)
+
+    try:
+        transcribe_live(args.source, args.model, args.backend, args.language, args.latency, on_update, args.output)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
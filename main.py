@@ -1,11 +1,24 @@
+import os
 import sys
-from PyQt5.QtWidgets import QApplication
-from ui import Transcribineitor
+from startup import StartupTimer
+
+# El cronómetro arranca antes de las importaciones pesadas para medirlas
+startup_timer = StartupTimer(
+    enabled="--startup-report" in sys.argv or bool(os.environ.get("TRANSCRIBINEITOR_STARTUP_REPORT"))
+)
+
+with startup_timer.phase("gui_import"):
+    from PyQt5.QtCore import QTimer
+    from PyQt5.QtWidgets import QApplication
+    from ui import Transcribineitor
 
 def main():
     app = QApplication(sys.argv)
-    window = Transcribineitor()
-    window.show()
+    with startup_timer.phase("window"):
+        window = Transcribineitor(startup_timer)
+        window.show()
+    # Se ejecuta en la primera vuelta del bucle de eventos, tras el primer pintado
+    QTimer.singleShot(0, lambda: startup_timer.mark("first_paint"))
     sys.exit(app.exec_())
 
 if __name__ == '__main__':
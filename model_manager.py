@@ -0,0 +1,118 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+MODEL_SIZES = ("tiny", "base", "small", "medium", "large", "turbo")
+DEFAULT_MODEL = "base"
+DEFAULT_BACKEND = "fp32"
+DEFAULT_BUDGET_FRACTION = 0.5  # Fracción de la RAM total que pueden ocupar los modelos cargados
+
+def total_memory():
+    """Memoria física total en bytes, o None si la plataforma no permite consultarla"""
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+def default_memory_budget():
+    """Presupuesto para los modelos cargados si no se configura otro: parte de la RAM total"""
+    total = total_memory()
+    return int(total * DEFAULT_BUDGET_FRACTION) if total else 4 * 1024 ** 3
+
+def model_size(model):
+    """Bytes que ocupan los parámetros y buffers de un modelo"""
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+class ModelManager:
+    """Registro de modelos Whisper: los carga en el primer uso y mantiene varios tamaños (y
+    variantes de cada motor de inferencia) en memoria mientras quepan en `memory_budget`
+    bytes, desalojando el usado hace más tiempo"""
+
+    def __init__(self, memory_budget=None, device=None):
+        self.memory_budget = memory_budget or default_memory_budget()
+        self.device = device
+        self._models = OrderedDict()  # nombre -> (modelo, bytes), del menos al más reciente
+        self._loading = {}  # nombre -> Future del modelo que se está cargando
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(name, backend=DEFAULT_BACKEND):
+        """Nombre con el que se registra un modelo: el tamaño, más el motor si no es fp32"""
+        return name if backend == DEFAULT_BACKEND else f"{name}-{backend}"
+
+    def get(self, name, backend=DEFAULT_BACKEND):
+        """Devuelve el modelo `name` del motor `backend`, cargándolo si hace falta. La carga
+        (que puede tardar minutos) se hace sin el cerrojo: mientras, los demás modelos siguen
+        disponibles, y quien pida el mismo modelo espera a esa misma carga"""
+        key = self.key(name, backend)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key][0]
+            future = self._loading.get(key)
+            loading = future is None
+            if loading:
+                future = self._loading[key] = Future()
+        if not loading:
+            return future.result()
+
+        try:
+            # Importación diferida: whisper arrastra torch y no debe retrasar el arranque
+            from backends import get_backend
+            model, size = get_backend(backend).load(name, self.device)
+        except BaseException as e:
+            with self._lock:
+                del self._loading[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._loading[key]
+            self._models[key] = (model, size)
+            self._models.move_to_end(key)
+            self._evict()
+        future.set_result(model)
+        return model
+
+    def register(self, name, model, size=None):
+        """Registra un modelo ya construido (p. ej. un modelo de prueba o una variante
+        cuantizada) para que los trabajos puedan pedirlo por nombre"""
+        with self._lock:
+            self._models[name] = (model, model_size(model) if size is None else size)
+            self._models.move_to_end(name)
+            self._evict()
+
+    def set_memory_budget(self, memory_budget):
+        """Cambia el presupuesto en bytes (None = el predeterminado) y desaloja lo que sobre"""
+        with self._lock:
+            self.memory_budget = memory_budget or default_memory_budget()
+            self._evict()
+
+    def _evict(self):
+        # Siempre se conserva al menos el último modelo pedido, aunque supere el presupuesto
+        while len(self._models) > 1 and self.memory_used() > self.memory_budget:
+            self._models.popitem(last=False)
+
+    def memory_used(self):
+        return sum(size for _, size in self._models.values())
+
+    def loaded(self):
+        """Nombres de los modelos en memoria, del usado hace más tiempo al más reciente"""
+        with self._lock:
+            return list(self._models)
+
+    def release(self, name, backend=DEFAULT_BACKEND):
+        """Libera un modelo; los trabajos que aún lo usan conservan su referencia"""
+        with self._lock:
+            self._models.pop(self.key(name, backend), None)
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+    def prewarm(self, name, backend=DEFAULT_BACKEND):
+        """Carga un modelo en segundo plano para que el primer trabajo no espere"""
+        thread = threading.Thread(target=self.get, args=(name, backend), daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,121 @@
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def peak_rss():
+    """Pico de memoria residente del proceso en bytes, o None si no se puede medir"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa en KiB y macOS en bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class JobProfiler:
+    """Instrumentación de un trabajo de transcripción: tiempo exclusivo por etapa (decode,
+    segmentación, mel, inferencia, escritura...), latencia por segmento, pico de RSS,
+    factor de tiempo real y ETA. Cada evento puede ir a un log JSON-lines y las estadísticas
+    acumuladas a `stats_callback`"""
+
+    def __init__(self, file_path, log_path=None, stats_callback=None):
+        self.file_path = file_path
+        self.stats_callback = stats_callback
+        self.log_file = open(log_path, "a", encoding="utf-8") if log_path else None
+        self.stages = {}
+        self.latencies = []
+        self.duration = 0.0
+        self.start_position = 0.0
+        self.position = 0.0
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def stage(self, name):
+        """Mide una etapa. Las etapas anidadas se descuentan de la exterior, de modo que cada
+        una acumula sólo su tiempo exclusivo aunque se ejecuten en hilos distintos"""
+        stack = self._local.__dict__.setdefault("stack", [])
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed - nested
+
+    def timed(self, iterable, name):
+        """Recorre un iterable contando el tiempo de producir cada elemento en la etapa `name`"""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                item = next(iterator, StopIteration)
+            if item is StopIteration:
+                return
+            yield item
+
+    def start(self, duration, start_position=0.0):
+        self.duration = duration
+        self.start_position = self.position = start_position
+        self.started = time.perf_counter()
+        self._log({"event": "start", "duration": duration, "resume_from": start_position})
+
+    def segment_done(self, segment, latency):
+        with self._lock:
+            self.latencies.append(latency)
+            self.position = segment.end
+        self._log({"event": "segment", "index": segment.index, "start": segment.start, "end": segment.end,
+                   "latency": latency})
+        if self.stats_callback:
+            self.stats_callback(self.snapshot())
+
+    def snapshot(self):
+        """Estadísticas acumuladas hasta ahora"""
+        elapsed = time.perf_counter() - self.started
+        processed = self.position - self.start_position
+        rtf = elapsed / processed if processed > 0 else None
+        remaining = max(0.0, self.duration - self.position)
+        with self._lock:
+            stages = dict(self.stages)
+            latencies = list(self.latencies)
+        return {
+            "file": self.file_path,
+            "elapsed": elapsed,
+            "audio_processed": processed,
+            "rtf": rtf,
+            "eta": remaining * rtf if rtf is not None else None,
+            "segments": len(latencies),
+            "latency_p50": percentile(latencies, 0.5),
+            "latency_p95": percentile(latencies, 0.95),
+            "stages": stages,
+            "peak_rss": peak_rss(),
+        }
+
+    def finish(self):
+        summary = self.snapshot()
+        self._log(dict(summary, event="summary"))
+        if self.log_file:
+            self.log_file.close()
+            self.log_file = None
+        return summary
+
+    def _log(self, record):
+        if self.log_file:
+            record["time"] = time.time()
+            self.log_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.log_file.flush()
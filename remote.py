@@ -0,0 +1,93 @@
+import threading
+
+from PyQt5.QtCore import QObject, pyqtSignal
+from jobs import JOB_FAILED, PRIORITY_NORMAL, QueuedJob
+from service_client import ServiceError
+
+class RemoteJobScheduler(QObject):
+    """La misma interfaz que JobScheduler, pero los trabajos se ejecutan en el servicio local
+    (service.py), que mantiene los modelos cargados: la ventana sólo envía las rutas y sigue
+    los eventos de cada trabajo. Al cerrarla, los trabajos siguen en el servicio"""
+    job_updated = pyqtSignal(int)
+    stats = pyqtSignal(dict)
+    idle = pyqtSignal()
+    # Eventos recibidos en los hilos de escucha; se atienden en el hilo de la interfaz
+    _event = pyqtSignal(int, str, object)
+
+    def __init__(self, client):
+        super().__init__()
+        self.client = client
+        self.jobs = {}
+        self.current = None
+        self.closed = False
+        self._event.connect(self._handle_event)
+
+    def submit(self, file_path, output_path, priority=PRIORITY_NORMAL, **job_options):
+        """Encola el audio en el servicio; lanza ServiceError si no lo acepta"""
+        status = self.client.submit(file_path, output_path, priority, **job_options)
+        job = QueuedJob(status["id"], file_path, output_path, priority, job_options)
+        self.jobs[job.id] = job
+        self._update(job, status)
+        threading.Thread(target=self._listen, args=(job.id,), daemon=True).start()
+        return job
+
+    def set_priority(self, job_id, priority):
+        self._call(self.client.set_priority, job_id, priority)
+
+    def pause(self, job_id):
+        self._call(self.client.pause, job_id)
+
+    def resume(self, job_id):
+        self._call(self.client.resume, job_id)
+
+    def cancel(self, job_id):
+        if not self.jobs[job_id].finished:
+            self._call(self.client.cancel, job_id)
+
+    def cancel_all(self):
+        for job_id in list(self.jobs):
+            self.cancel(job_id)
+
+    def is_busy(self):
+        return self.current is not None
+
+    def shutdown(self):
+        # Los hilos de escucha son daemon: basta con dejar de atender sus eventos
+        self.closed = True
+
+    def _call(self, method, job_id, *args):
+        try:
+            self._update(self.jobs[job_id], method(job_id, *args))
+        except ServiceError as e:
+            print(f"Error del servicio de transcripción: {e}")
+
+    def _listen(self, job_id):
+        try:
+            for event, data in self.client.events(job_id):
+                if self.closed:
+                    return
+                self._event.emit(job_id, event, data)
+        except ServiceError as e:
+            if not self.closed:
+                self._event.emit(job_id, "error", {"error": str(e)})
+
+    def _handle_event(self, job_id, event, data):
+        job = self.jobs[job_id]
+        if event == "status":
+            self._update(job, data)
+        elif event == "stats" and job is self.current:
+            self.stats.emit(data)
+        elif event == "error" and not job.finished:
+            self._update(job, dict(job.status(), state=JOB_FAILED, error=data["error"]))
+
+    def _update(self, job, status):
+        was_finished = job.finished
+        job.state, job.progress, job.error = status["state"], status["progress"], status["error"]
+        job.priority = status["priority"]
+        if job.active:
+            self.current = job
+        elif job is self.current:
+            self.current = None
+        self.job_updated.emit(job.id)
+        if job.finished and not was_finished and not any(not other.finished for other in self.jobs.values()):
+            self.idle.emit()
@@ -0,0 +1,527 @@
+import argparse
+import ipaddress
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import torch
+from archive import SEARCH_LIMIT, TranscriptArchive
+from backends import BACKENDS
+from config_manager import ConfigManager
+from engine import OUTPUT_FORMATS, model_manager, transcribe_file
+from jobs import (JOB_CANCELLED, JOB_DONE, JOB_FAILED, JOB_PAUSED, JOB_QUEUED, JOB_RUNNING, PRIORITY_NORMAL,
+                  JobCancelled, JobQueue)
+from model_manager import DEFAULT_BACKEND, DEFAULT_MODEL, MODEL_SIZES
+from service_client import DEFAULT_PORT
+from tuner import ensure_profile, resources
+from utils import default_output_path
+
+KEEPALIVE_SECONDS = 15  # Comentario SSE enviado si no hay eventos, para detectar clientes desconectados
+EVENTS_GRACE_SECONDS = 60  # Tras terminar un trabajo, sus segmentos y estadísticas se repiten aún este tiempo
+FINISHED_JOB_SECONDS = 3600  # Tiempo que se conserva el estado (y el resultado subido) de un trabajo terminado
+MAX_FINISHED_JOBS = 200  # Trabajos terminados que se conservan como máximo
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1")
+# Tipos de contenido de POST /jobs: ambos obligan a un navegador a preguntar antes (CORS)
+UPLOAD_CONTENT_TYPES = ("application/json", "application/octet-stream")
+
+# Opciones de transcribe_file que acepta el servicio y cómo convertirlas desde la URL
+JOB_OPTIONS = {
+    "model_name": str,
+    "backend": str,
+    "language": str,
+    "batch_size": int,
+    "use_vad": lambda value: str(value).lower() not in ("0", "false", "no"),
+    "use_cache": lambda value: str(value).lower() not in ("0", "false", "no"),
+    "use_archive": lambda value: str(value).lower() not in ("0", "false", "no"),
+}
+
+CONTENT_TYPES = {"txt": "text/plain", "srt": "application/x-subrip", "vtt": "text/vtt", "jsonl": "application/jsonl"}
+
+class TranscriptionService:
+    """Servicio de transcripción de larga duración: mantiene los modelos cargados entre
+    trabajos y atiende una cola con prioridades de uno en uno (el modelo ya usa todos los
+    núcleos). Cada trabajo acumula sus eventos (estado, segmentos, estadísticas) para que
+    los clientes los sigan en vivo o los repitan desde el principio"""
+
+    def __init__(self, config=None, output_dir=None, model_name=DEFAULT_MODEL, backend=DEFAULT_BACKEND):
+        self.config = config or ConfigManager()
+        self.output_dir = output_dir  # None: junto a cada audio
+        self.model_name = model_name
+        self.backend = backend
+        self.queue = JobQueue()
+        self.jobs = self.queue.jobs
+        self.events = {}  # id -> [(evento, datos)]
+        # id -> eventos descartados al compactar un trabajo terminado (los números no cambian)
+        self.event_offsets = {}
+        self.finished_at = {}  # id -> instante (monotonic) en que terminó
+        self.uploads = {}  # id -> audio recibido por HTTP, que se borra al terminar el trabajo
+        self.upload_dir = tempfile.mkdtemp(prefix="transcribineitor-")
+        # Protege estados y eventos; despierta al hilo de trabajo y a los clientes en espera
+        self.condition = threading.Condition()
+        self.stopping = False
+        self.worker = threading.Thread(target=self._work, daemon=True)
+
+    def start(self, models=()):
+        """Carga los modelos indicados [(nombre, motor)] y empieza a atender la cola"""
+        for name, backend in models:
+            model_manager.get(name, backend)
+        self.worker.start()
+
+    def stop(self):
+        """Cancela los trabajos pendientes, espera al que está en curso y borra los audios recibidos"""
+        with self.condition:
+            self.stopping = True
+            for job_id in list(self.jobs):
+                self.cancel(job_id)
+            self.condition.notify_all()
+        if self.worker.is_alive():
+            self.worker.join()
+        shutil.rmtree(self.upload_dir, ignore_errors=True)
+
+    def submit(self, file_path, output_path=None, priority=PRIORITY_NORMAL, output_format="txt", upload=None,
+               **job_options):
+        """Encola un audio. `upload` es el contenido del audio cuando llega por HTTP en lugar
+        de como ruta; la transcripción se guarda entonces en el directorio de salida del servicio
+        y no se admite `output_path`"""
+        unknown = set(job_options) - set(JOB_OPTIONS)
+        if unknown:
+            raise ValueError(f"Opciones desconocidas: {', '.join(sorted(unknown))}")
+        job_options = {key: JOB_OPTIONS[key](value) for key, value in job_options.items() if value is not None}
+        model_name = job_options.setdefault("model_name", self.model_name)
+        if model_name not in MODEL_SIZES:
+            raise ValueError(f"Modelo desconocido: {model_name}")
+        if job_options.setdefault("backend", self.backend) not in BACKENDS:
+            raise ValueError(f"Motor de inferencia desconocido: {job_options['backend']}")
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Formato de salida desconocido: {output_format}")
+        job_options.setdefault("batch_size", resources(self.config, model_name)["batch_size"])
+        job_options.setdefault("cache_directory", self.config.get_cache_directory() or None)
+        job_options.setdefault("archive_directory", self.config.get_archive_directory() or None)
+
+        output_dir = self.output_dir
+        if upload is not None:
+            if output_path:
+                raise ValueError("Un audio subido no admite 'output': la transcripción se obtiene con /result")
+            # Cada audio recibido en su propio directorio, conservando el nombre original. En
+            # --output-dir, cada uno con su subdirectorio: dos subidas con el mismo nombre no
+            # deben compartir transcripción ni diario
+            name = os.path.basename(file_path) or "audio"
+            directory = tempfile.mkdtemp(dir=self.upload_dir)
+            file_path = os.path.join(directory, name)
+            with open(file_path, "wb") as file:
+                file.write(upload)
+            if output_dir:
+                output_dir = tempfile.mkdtemp(dir=output_dir, prefix=f"{os.path.splitext(name)[0]}-")
+            else:
+                output_dir = directory
+        elif not os.path.isfile(file_path):
+            raise ValueError(f"No existe el archivo de audio: {file_path}")
+        output_path = output_path or default_output_path(file_path, output_dir, output_format)
+
+        with self.condition:
+            # Dos trabajos en curso con la misma salida se pisarían la transcripción y el diario
+            target = os.path.normcase(os.path.abspath(output_path))
+            for other in self.jobs.values():
+                if not other.finished and os.path.normcase(os.path.abspath(other.output_path)) == target:
+                    raise ValueError(f"El trabajo {other.id} ya escribe en {output_path}")
+            job = self.queue.add(file_path, output_path, priority, **job_options)
+            self.events[job.id] = []
+            self.event_offsets[job.id] = 0
+            if upload is not None:
+                self.uploads[job.id] = file_path
+            self._publish(job, "status", job.status())
+            self.condition.notify_all()
+        return job
+
+    def set_priority(self, job_id, priority):
+        with self.condition:
+            job = self.jobs[job_id]
+            if self.queue.set_priority(job_id, priority):
+                self._publish(job, "status", job.status())
+            return job
+
+    def pause(self, job_id):
+        with self.condition:
+            job = self.jobs[job_id]
+            if job.state == JOB_RUNNING:
+                job.control.pause()
+                self._set_state(job, JOB_PAUSED)
+            return job
+
+    def resume(self, job_id):
+        with self.condition:
+            job = self.jobs[job_id]
+            if job.state == JOB_PAUSED:
+                job.control.resume()
+                self._set_state(job, JOB_RUNNING)
+            return job
+
+    def cancel(self, job_id):
+        with self.condition:
+            job = self.jobs[job_id]
+            if job.state == JOB_QUEUED:
+                self._set_state(job, JOB_CANCELLED)
+                self._remove_upload(job)
+            elif job.active:
+                # El hilo de trabajo se detiene en el siguiente lote y marca el trabajo cancelado
+                job.control.cancel()
+            return job
+
+    def events_since(self, job_id, index, timeout=None):
+        """Eventos del trabajo a partir del número `index`; espera hasta `timeout` segundos a
+        que haya alguno. Devuelve (primer número, eventos, terminado): si terminado, no habrá
+        más eventos. Si el trabajo ya se compactó, los eventos descartados no se repiten"""
+        with self.condition:
+            job = self.jobs[job_id]
+            self.condition.wait_for(
+                lambda: self.event_offsets[job_id] + len(self.events[job_id]) > index or job.finished or self.stopping,
+                timeout)
+            offset = self.event_offsets[job_id]
+            index = max(index, offset)
+            return index, self.events[job_id][index - offset:], job.finished or self.stopping
+
+    def _publish(self, job, event, data):
+        with self.condition:
+            self.events[job.id].append((event, data))
+            self.condition.notify_all()
+
+    def _set_state(self, job, state):
+        # El estado y su evento cambian juntos: quien ve el trabajo terminado ya tiene todos sus eventos
+        with self.condition:
+            job.state = state
+            self._publish(job, "status", job.status())
+            if job.finished:
+                self.finished_at[job.id] = time.monotonic()
+
+    def _expire(self):
+        """Limita la memoria de un servicio de larga duración: pasado EVENTS_GRACE_SECONDS, un
+        trabajo terminado sólo conserva su resumen y su estado final; pasado FINISHED_JOB_SECONDS
+        (o si hay más de MAX_FINISHED_JOBS terminados) se olvida del todo"""
+        with self.condition:
+            now = time.monotonic()
+            finished = sorted(self.finished_at.items(), key=lambda item: item[1], reverse=True)
+            for position, (job_id, finished_at) in enumerate(finished):
+                if position >= MAX_FINISHED_JOBS or now - finished_at >= FINISHED_JOB_SECONDS:
+                    self._forget(job_id)
+                elif now - finished_at >= EVENTS_GRACE_SECONDS:
+                    events = self.events[job_id]
+                    kept = [(event, data) for event, data in events if event == "summary"] + events[-1:]
+                    self.event_offsets[job_id] += len(events) - len(kept)
+                    self.events[job_id] = kept
+
+    def _forget(self, job_id):
+        job = self.queue.remove(job_id)
+        del self.events[job_id], self.event_offsets[job_id], self.finished_at[job_id]
+        # El audio subido (y su transcripción, si no hay --output-dir) vive en su directorio temporal
+        directory = os.path.dirname(job.file_path)
+        if os.path.dirname(directory) == self.upload_dir:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def _progress(self, job, percent):
+        with self.condition:
+            job.progress = percent
+            self._publish(job, "status", job.status())
+
+    def _remove_upload(self, job):
+        upload = self.uploads.pop(job.id, None)
+        if upload:
+            os.remove(upload)
+
+    def _work(self):
+        while True:
+            with self.condition:
+                job = self.queue.pop()
+                while job is None and not self.stopping:
+                    self.condition.wait(EVENTS_GRACE_SECONDS)
+                    self._expire()
+                    job = self.queue.pop()
+                if job is None:
+                    return
+                self._set_state(job, JOB_RUNNING)
+            self._run(job)
+            self._expire()
+
+    def _run(self, job):
+        try:
+            summary = transcribe_file(job.file_path, job.output_path,
+                                      progress_callback=lambda percent: self._progress(job, percent),
+                                      stats_callback=lambda stats: self._publish(job, "stats", stats),
+                                      segment_callback=lambda entry: self._publish(job, "segment", entry),
+                                      control=job.control, **job.job_options)
+        except JobCancelled:
+            self._set_state(job, JOB_CANCELLED)
+        except Exception as e:
+            job.error = str(e)
+            self._set_state(job, JOB_FAILED)
+        else:
+            self._publish(job, "summary", summary)
+            job.progress = 100
+            self._set_state(job, JOB_DONE)
+        finally:
+            with self.condition:
+                self._remove_upload(job)
+
+def _is_address(host):
+    if host in LOCAL_HOSTS:
+        return True
+    try:
+        ipaddress.ip_address(host or "")
+        return True
+    except ValueError:
+        return False
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """API HTTP del servicio:
+
+    POST   /jobs                 encola un audio: JSON {"file", "output", "priority", "format",
+                                 opciones...} o el contenido del audio con las opciones en la URL
+    GET    /jobs                 estado de todos los trabajos
+    GET    /jobs/<id>            estado de un trabajo
+    GET    /jobs/<id>/result     transcripción de un trabajo completado
+    GET    /jobs/<id>/events     eventos en vivo (server-sent events)
+    POST   /jobs/<id>/pause      pausa entre lotes; /resume la reanuda
+    POST   /jobs/<id>/priority   cambia la prioridad de un trabajo en cola ({"priority"})
+    DELETE /jobs/<id>            cancela el trabajo
+    GET    /search?q=            busca en el archivo de transcripciones (limit, language, model)
+    GET    /health               modelos cargados y trabajos pendientes"""
+    server_version = "Transcribineitor"
+    route = re.compile(r"^/jobs/(\d+)(?:/(result|events|pause|resume|priority))?$")
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def _allowed(self):
+        """Rechaza peticiones de páginas web: un navegador puede enviar algunas sin preguntar
+        (CORS) y, con un dominio que resuelve a 127.0.0.1, hasta leer las respuestas. Host debe
+        ser localhost o una IP, y Origin (si lo hay) el mismo equipo al que va la petición"""
+        host = urlparse(f"//{self.headers.get('Host', '')}").hostname
+        origin = self.headers.get("Origin")
+        if not _is_address(host) or (origin is not None and urlparse(origin).hostname != host):
+            self._send_error(403, "Origen no permitido")
+            return False
+        return True
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message):
+        self._send_json({"error": message}, status)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _read_json(self):
+        """Cuerpo JSON de la petición, que debe ser un objeto"""
+        body = json.loads(self._read_body() or b"{}")
+        if not isinstance(body, dict):
+            raise ValueError("El cuerpo de la petición debe ser un objeto JSON")
+        return body
+
+    def _read_priority(self):
+        priority = self._read_json().get("priority")
+        if not isinstance(priority, int):
+            raise ValueError("Falta la prioridad ('priority') o no es un número entero")
+        return priority
+
+    def _dispatch(self, handler, *args):
+        try:
+            handler(*args)
+        except KeyError as e:
+            self._send_error(404, f"No existe el trabajo {e}")
+        except ValueError as e:
+            self._send_error(400, str(e))
+
+    def do_GET(self):
+        if not self._allowed():
+            return
+        url = urlparse(self.path)
+        if url.path == "/health":
+            self._send_json({"models": model_manager.loaded(),
+                             "pending": len(self.service.queue.waiting())})
+            return
+        if url.path == "/jobs":
+            self._send_json([job.status() for job in list(self.service.jobs.values())])
+            return
+        if url.path == "/search":
+            self._dispatch(self._search, parse_qs(url.query))
+            return
+        match = self.route.match(url.path)
+        if not match or match.group(2) not in (None, "result", "events"):
+            self._send_error(404, "Ruta desconocida")
+            return
+        job_id, action = int(match.group(1)), match.group(2)
+        if action == "result":
+            self._dispatch(self._send_result, job_id)
+        elif action == "events":
+            start = int(parse_qs(url.query).get("from", ["0"])[0])
+            self._dispatch(self._stream_events, job_id, start)
+        else:
+            self._dispatch(lambda: self._send_json(self.service.jobs[job_id].status()))
+
+    def do_POST(self):
+        if not self._allowed():
+            return
+        url = urlparse(self.path)
+        if url.path == "/jobs":
+            self._dispatch(self._submit, url)
+            return
+        match = self.route.match(url.path)
+        if not match or match.group(2) not in ("pause", "resume", "priority"):
+            self._send_error(404, "Ruta desconocida")
+            return
+        job_id, action = int(match.group(1)), match.group(2)
+        if action == "priority":
+            self._dispatch(lambda: self._send_json(
+                self.service.set_priority(job_id, self._read_priority()).status()))
+        else:
+            self._dispatch(lambda: self._send_json(getattr(self.service, action)(job_id).status()))
+
+    def do_DELETE(self):
+        if not self._allowed():
+            return
+        match = self.route.match(urlparse(self.path).path)
+        if not match or match.group(2):
+            self._send_error(404, "Ruta desconocida")
+            return
+        self._dispatch(lambda: self._send_json(self.service.cancel(int(match.group(1))).status()))
+
+    def _submit(self, url):
+        content_type = self.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if content_type not in UPLOAD_CONTENT_TYPES:
+            self._send_error(415, f"Tipo de contenido no admitido: use {' o '.join(UPLOAD_CONTENT_TYPES)}")
+            return
+        if content_type == "application/json":
+            options = self._read_json()
+            file_path, upload = options.pop("file", None), None
+            if not file_path:
+                raise ValueError("Falta la ruta del audio ('file')")
+        else:
+            # Audio en el cuerpo de la petición; nombre y opciones en la URL
+            options = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            file_path, upload = options.pop("name", "audio"), self._read_body()
+            if not upload:
+                raise ValueError("La petición no contiene audio")
+        job = self.service.submit(file_path, options.pop("output", None),
+                                  int(options.pop("priority", PRIORITY_NORMAL)),
+                                  options.pop("format", "txt"), upload, **options)
+        self._send_json(job.status(), 201)
+
+    def _search(self, query):
+        text = query.get("q", [""])[-1]
+        if not text.strip():
+            raise ValueError("Falta el texto a buscar ('q')")
+        # Una conexión por petición: cada petición se atiende en su propio hilo
+        archive = TranscriptArchive(self.service.config.get_archive_directory() or None)
+        try:
+            hits = archive.search(text, int(query.get("limit", [SEARCH_LIMIT])[-1]),
+                                  int(query.get("offset", [0])[-1]), query.get("language", [None])[-1],
+                                  query.get("model", [None])[-1])
+        finally:
+            archive.close()
+        self._send_json(hits)
+
+    def _send_result(self, job_id):
+        job = self.service.jobs[job_id]
+        if not job.completed:
+            self._send_error(409, f"El trabajo no está completado ({job.state})")
+            return
+        with open(job.output_path, "rb") as file:
+            body = file.read()
+        extension = os.path.splitext(job.output_path)[1].lstrip(".").lower()
+        self.send_response(200)
+        self.send_header("Content-Type", f"{CONTENT_TYPES.get(extension, 'text/plain')}; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream_events(self, job_id, index):
+        """Server-sent events: cada evento lleva su número como id, así un cliente que se
+        reconecta puede pedir los que le faltan con ?from=. Al terminar el trabajo se envía
+        "end" y se cierra la conexión"""
+        self.service.jobs[job_id]  # 404 antes de empezar la respuesta
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            while True:
+                index, events, finished = self.service.events_since(job_id, index, KEEPALIVE_SECONDS)
+                chunk = []
+                for event, data in events:
+                    chunk.append(f"id: {index}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n")
+                    index += 1
+                if finished:
+                    chunk.append("event: end\ndata: {}\n\n")
+                elif not events:
+                    chunk.append(": ping\n\n")
+                self.wfile.write("".join(chunk).encode("utf-8"))
+                self.wfile.flush()
+                if finished:
+                    return
+        except (BrokenPipeError, ConnectionResetError):
+            return  # El cliente dejó de escuchar; el trabajo sigue en la cola
+
+def main(argv=None):
+    config = ConfigManager()
+    parser = argparse.ArgumentParser(prog="python -m service",
+                                     description="Servicio local de transcripción con los modelos siempre cargados")
+    parser.add_argument("--host", default="127.0.0.1", help="Dirección en la que escuchar (por defecto, sólo local)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Puerto HTTP")
+    parser.add_argument("-m", "--model", nargs="+", choices=MODEL_SIZES, default=[config.get_model() or DEFAULT_MODEL],
+                        help="Modelos a mantener cargados; el primero es el predeterminado de los trabajos")
+    parser.add_argument("--backend", choices=list(BACKENDS), default=config.get_backend() or DEFAULT_BACKEND,
+                        help="Motor de inferencia predeterminado")
+    parser.add_argument("-o", "--output-dir",
+                        help="Directorio de salida de los trabajos sin ruta de salida (por defecto, junto al audio)")
+    parser.add_argument("--model-memory", type=int, default=config.get_model_memory_budget(), metavar="MB",
+                        help="MB que pueden ocupar los modelos cargados (por defecto, la mitad de la RAM)")
+    parser.add_argument("--no-tune", action="store_true",
+                        help="No medir el rendimiento del equipo aunque no haya perfil guardado")
+    args = parser.parse_args(argv)
+
+    def log(message):
+        print(message, file=sys.stderr)
+
+    model_name = args.model[0]
+    if not args.no_tune:
+        ensure_profile(config, model_name, log=log)
+    threads = resources(config, model_name)["threads"]
+    if threads:
+        torch.set_num_threads(threads)
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    model_manager.set_memory_budget(args.model_memory * 1024 ** 2)
+    service = TranscriptionService(config, args.output_dir, model_name, args.backend)
+    log(f"Cargando {', '.join(args.model)} ({args.backend})...")
+    service.start([(name, args.backend) for name in args.model])
+
+    server = ThreadingHTTPServer((args.host, args.port), ServiceHandler)
+    server.daemon_threads = True
+    server.service = service
+    log(f"Servicio escuchando en http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+import argparse
+import json
+import os
+import sys
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from jobs import JOB_DONE
+
+DEFAULT_PORT = 8765
+DEFAULT_URL = f"http://127.0.0.1:{DEFAULT_PORT}"
+EVENTS_TIMEOUT = 60  # Segundos sin datos antes de dar por perdida la conexión (el servicio envía pings)
+
+class ServiceError(Exception):
+    """El servicio respondió con un error o no se pudo conectar con él"""
+
+class ServiceClient:
+    """Cliente del servicio local de transcripción (service.py). Sólo usa la biblioteca
+    estándar, así que no importa torch ni whisper: los modelos viven en el servicio"""
+
+    def __init__(self, url=DEFAULT_URL, timeout=10):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _open(self, method, path, body=None, content_type="application/json", timeout=None):
+        if isinstance(body, dict):
+            body = json.dumps(body).encode("utf-8")
+        headers = {"Content-Type": content_type} if body is not None else {}
+        request = Request(self.url + path, data=body, method=method, headers=headers)
+        try:
+            return urlopen(request, timeout=timeout or self.timeout)
+        except HTTPError as e:
+            try:
+                message = json.loads(e.read().decode("utf-8"))["error"]
+            except (ValueError, KeyError):
+                message = e.reason
+            raise ServiceError(message) from e
+        except (URLError, OSError) as e:
+            raise ServiceError(f"No se pudo conectar con el servicio en {self.url}: {e}") from e
+
+    def _request(self, method, path, body=None, content_type="application/json"):
+        with self._open(method, path, body, content_type) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    def health(self):
+        return self._request("GET", "/health")
+
+    def available(self):
+        try:
+            self.health()
+            return True
+        except ServiceError:
+            return False
+
+    def submit(self, file_path, output_path=None, priority=None, **options):
+        """Encola un audio que el servicio puede leer (misma máquina). Devuelve el estado del trabajo"""
+        body = dict(options, file=os.path.abspath(file_path))
+        if output_path:
+            body["output"] = os.path.abspath(output_path)
+        if priority is not None:
+            body["priority"] = priority
+        return self._request("POST", "/jobs", body)
+
+    def upload(self, file_path, priority=None, **options):
+        """Envía el contenido del audio; la transcripción queda en el servicio (ver result)"""
+        query = {key: value for key, value in options.items() if value is not None}
+        query["name"] = os.path.basename(file_path)
+        if priority is not None:
+            query["priority"] = priority
+        with open(file_path, "rb") as file:
+            return self._request("POST", f"/jobs?{urlencode(query)}", file.read(), "application/octet-stream")
+
+    def jobs(self):
+        return self._request("GET", "/jobs")
+
+    def status(self, job_id):
+        return self._request("GET", f"/jobs/{job_id}")
+
+    def result(self, job_id):
+        """Texto de la transcripción de un trabajo completado"""
+        with self._open("GET", f"/jobs/{job_id}/result") as response:
+            return response.read().decode("utf-8")
+
+    def search(self, query, limit=None, language=None, model=None):
+        """Frases del archivo de transcripciones que contienen `query` (ver archive.py)"""
+        parameters = {key: value for key, value in (("q", query), ("limit", limit), ("language", language),
+                                                    ("model", model)) if value is not None}
+        return self._request("GET", f"/search?{urlencode(parameters)}")
+
+    def set_priority(self, job_id, priority):
+        return self._request("POST", f"/jobs/{job_id}/priority", {"priority": priority})
+
+    def pause(self, job_id):
+        return self._request("POST", f"/jobs/{job_id}/pause")
+
+    def resume(self, job_id):
+        return self._request("POST", f"/jobs/{job_id}/resume")
+
+    def cancel(self, job_id):
+        return self._request("DELETE", f"/jobs/{job_id}")
+
+    def events(self, job_id, start=0):
+        """Genera (evento, datos) del trabajo a medida que ocurren, desde el evento número
+        `start`: "status" (estado y progreso), "segment" (entrada con texto y tiempos),
+        "stats" y "summary". Termina cuando el trabajo finaliza"""
+        response = self._open("GET", f"/jobs/{job_id}/events?from={start}", timeout=EVENTS_TIMEOUT)
+        event, data = None, []
+        try:
+            with response:
+                for raw_line in response:
+                    line = raw_line.decode("utf-8").rstrip("\r\n")
+                    if line.startswith("event:"):
+                        event = line[6:].strip()
+                    elif line.startswith("data:"):
+                        data.append(line[5:].strip())
+                    elif not line and event:
+                        if event == "end":
+                            return
+                        yield event, json.loads("\n".join(data)) if data else None
+                        event, data = None, []
+        except OSError as e:
+            raise ServiceError(f"Se perdió la conexión con el servicio: {e}") from e
+        raise ServiceError("El servicio cerró la conexión antes de terminar el trabajo")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m service_client",
+                                     description="Transcribe con el servicio local y muestra el texto según se produce")
+    parser.add_argument("input", help="Archivo de audio")
+    parser.add_argument("-o", "--output", help="Archivo de salida (por defecto, junto al audio)")
+    parser.add_argument("--url", default=DEFAULT_URL, help="Dirección del servicio")
+    parser.add_argument("--upload", action="store_true",
+                        help="Enviar el contenido del audio en lugar de su ruta (el servicio guarda la salida)")
+    parser.add_argument("-m", "--model", help="Tamaño del modelo Whisper (por defecto, el del servicio)")
+    parser.add_argument("-l", "--language", help="Código de idioma; por defecto se detecta")
+    parser.add_argument("-f", "--format", help="Formato de salida si no se indica --output (txt, srt, vtt, jsonl)")
+    args = parser.parse_args(argv)
+
+    client = ServiceClient(args.url)
+    options = {key: value for key, value in (("model_name", args.model), ("language", args.language),
+                                             ("format", args.format)) if value}
+    try:
+        if args.upload:
+            job = client.upload(args.input, **options)
+        else:
+            job = client.submit(args.input, args.output, **options)
+        status = job
+        for event, data in client.events(job["id"]):
+            if event == "segment" and data["text"]:
+                print(data["text"], flush=True)
+            elif event == "status":
+                status = data
+        if status["state"] != JOB_DONE:
+            print(f"{status['state']}: {status['error'] or ''}", file=sys.stderr)
+            return 1
+        if args.upload and args.output:
+            with open(args.output, "w", encoding="utf-8") as file:
+                file.write(client.result(job["id"]))
+    except ServiceError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+import sys
+import time
+from contextlib import contextmanager
+
+TIME_TO_FIRST_PAINT_BUDGET = 1.0  # Segundos máximos hasta que la ventana se pinta
+
+class StartupTimer:
+    """Mide las fases del arranque (importaciones, configuración, QSS, carga del modelo)
+    y el tiempo hasta que la ventana se pinta por primera vez"""
+
+    def __init__(self, enabled=False, budget=TIME_TO_FIRST_PAINT_BUDGET):
+        self.enabled = enabled
+        self.budget = budget
+        self.origin = time.perf_counter()
+        self.phases = {}
+        self.marks = {}
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def mark(self, name):
+        """Registra un instante medido desde el inicio del proceso"""
+        self.marks[name] = time.perf_counter() - self.origin
+
+    def report(self):
+        """Texto con la duración de cada fase y si se cumplió el presupuesto de primer pintado"""
+        lines = ["Informe de arranque:"]
+        for name, seconds in self.phases.items():
+            lines.append(f"  {name:<16} {seconds * 1000:8.1f} ms")
+        for name, seconds in self.marks.items():
+            lines.append(f"  @{name:<15} {seconds * 1000:8.1f} ms")
+        first_paint = self.marks.get("first_paint")
+        if first_paint is not None:
+            status = "OK" if first_paint <= self.budget else "EXCEDIDO"
+            lines.append(f"  Presupuesto de primer pintado: {self.budget * 1000:.0f} ms ({status})")
+        return "\n".join(lines)
+
+    def print_report(self):
+        if self.enabled:
+            print(self.report(), file=sys.stderr)
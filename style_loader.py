@@ -1,8 +1,54 @@
-import re
+import hashlib
+import json
+import math
 import os
+import re
+import tempfile
+from functools import lru_cache
+
+from cache import default_cache_directory
+
+# Cambiar si se modifica la plantilla QSS, para invalidar los temas compilados en disco
+# (los cambios en `oklch_colors` invalidan la caché por sí solos)
+THEME_CACHE_VERSION = "1"
+
+@lru_cache(maxsize=None)
+def oklch_to_srgb_hex(value):
+    """Convierte 'oklch(L C H)' a '#rrggbb' (OKLCH -> OKLab -> sRGB lineal -> sRGB)"""
+    match = re.fullmatch(r'oklch\(\s*([\d.]+)(%?)\s+([\d.]+)\s+([\d.]+)(?:deg)?\s*(?:/\s*[\d.%]+\s*)?\)', value.strip())
+    if not match:
+        raise ValueError(value)
+    lightness = float(match.group(1)) / (100 if match.group(2) else 1)
+    chroma = float(match.group(3))
+    hue = math.radians(float(match.group(4)))
+    a = chroma * math.cos(hue)
+    b = chroma * math.sin(hue)
+
+    l_ = (lightness + 0.3963377774 * a + 0.2158037573 * b) ** 3
+    m_ = (lightness - 0.1055613458 * a - 0.0638541728 * b) ** 3
+    s_ = (lightness - 0.0894841775 * a - 1.2914855480 * b) ** 3
+
+    linear = (
+        4.0767416621 * l_ - 3.3077115913 * m_ + 0.2309699292 * s_,
+        -1.2684380046 * l_ + 2.6097574011 * m_ - 0.3413193965 * s_,
+        -0.0041960863 * l_ - 0.7034186147 * m_ + 1.7076147010 * s_,
+    )
+
+    def encode(channel):
+        channel = min(1.0, max(0.0, channel))
+        if channel <= 0.0031308:
+            channel *= 12.92
+        else:
+            channel = 1.055 * channel ** (1 / 2.4) - 0.055
+        return round(channel * 255)
+
+    return "#{:02x}{:02x}{:02x}".format(*(encode(channel) for channel in linear))
 
 class CSSToQSSConverter:
-    def __init__(self):
+    def __init__(self, theme_cache_path=None):
+        self.theme_cache_path = theme_cache_path or os.path.join(default_cache_directory(), "themes.json")
+        self._compiled = None
+        self._compiled_source = None
         # Mapeo de colores OKLCH a valores hexadecimales
         self.oklch_colors = {
             # Modo claro
@@ -25,45 +71,27 @@ class CSSToQSSConverter:
             "oklch(0.7516 0.2509 326.9361)": "#e74c3c",  # Destructive rojo
         }
     
-    def load_css_variables(self, css_file_path, dark_mode=False):
-        """Carga las variables CSS del archivo y las convierte a valores hexadecimales"""
-        variables = {}
-        
-        if not os.path.exists(css_file_path):
-            return self.get_default_variables(dark_mode)
-        
+    def parse_css(self, content):
+        """Recorre la hoja de estilos una sola vez y devuelve las variables de color de
+        :root (tema claro) y .dark (tema oscuro), ya convertidas a hexadecimal"""
+        themes = {'light': {}, 'dark': {}}
+        for block in re.finditer(r'(:root|\.dark)\s*\{([^}]*)\}', content):
+            theme = themes['dark' if block.group(1) == '.dark' else 'light']
+            for var in re.finditer(r'--([\w-]+)\s*:\s*(oklch\([^)]+\))\s*;', block.group(2)):
+                theme[var.group(1)] = self.oklch_to_hex(var.group(2))
+        return themes
+
+    def oklch_to_hex(self, value):
+        """Convierte un color oklch(...) a hexadecimal. Los colores ajustados a mano en
+        `oklch_colors` tienen prioridad; el resto se convierte matemáticamente"""
+        if value in self.oklch_colors:
+            return self.oklch_colors[value]
         try:
-            with open(css_file_path, 'r', encoding='utf-8') as file:
-                content = file.read()
-            
-            # Buscar variables en :root o .dark según el modo
-            if dark_mode:
-                section_match = re.search(r'\.dark\s*\{([^}]+)\}', content, re.DOTALL)
-            else:
-                section_match = re.search(r':root\s*\{([^}]+)\}', content, re.DOTALL)
-            
-            if section_match:
-                section_content = section_match.group(1)
-                
-                # Buscar variables con valores OKLCH
-                var_pattern = r'--([^:]+):\s*oklch\([^)]+\);'
-                matches = re.findall(var_pattern, section_content)
-                
-                for var_name in matches:
-                    # Extraer el valor OKLCH completo
-                    value_pattern = rf'--{re.escape(var_name)}:\s*(oklch\([^)]+\));'
-                    value_match = re.search(value_pattern, section_content)
-                    if value_match:
-                        oklch_value = value_match.group(1)
-                        hex_value = self.oklch_colors.get(oklch_value, "#000000")
-                        variables[var_name] = hex_value
-            
-            return variables
-        
-        except Exception as e:
-            print(f"Error leyendo archivo CSS: {e}")
-            return self.get_default_variables(dark_mode)
-    
+            return oklch_to_srgb_hex(value)
+        except ValueError:
+            print(f"Color OKLCH no válido: {value}")
+            return "#000000"
+
     def get_default_variables(self, dark_mode=False):
         """Variables por defecto si no se puede leer el archivo CSS"""
         if dark_mode:
@@ -90,9 +118,86 @@ class CSSToQSSConverter:
             }
     
     def generate_qss(self, css_file_path, dark_mode=False):
+        """Devuelve el QSS del tema pedido. Ambos temas se compilan juntos y se guardan en
+        memoria y en disco; sólo se vuelve a leer el CSS si cambia su fecha o su contenido"""
+        theme = 'dark' if dark_mode else 'light'
+        source = self._source_stamp(css_file_path)
+        if self._compiled is None or self._compiled_source != source:
+            self._compiled = self.load_compiled(css_file_path)
+            self._compiled_source = source
+        return self._compiled[theme]
+
+    def cache_version(self):
+        """Versión de los temas compilados: la de la plantilla más los colores ajustados a mano"""
+        colors = json.dumps(self.oklch_colors, sort_keys=True).encode()
+        return f"{THEME_CACHE_VERSION}:{hashlib.sha256(colors).hexdigest()[:16]}"
+
+    def _source_stamp(self, css_file_path):
+        try:
+            stat = os.stat(css_file_path)
+            return os.path.abspath(css_file_path), stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return os.path.abspath(css_file_path), None, None
+
+    def load_compiled(self, css_file_path):
+        """Obtiene los QSS compilados desde la caché en disco o, si el CSS cambió, los compila"""
+        path, mtime, size = self._source_stamp(css_file_path)
+        if mtime is None:
+            return {
+                'light': self.build_qss(self.get_default_variables(False), False),
+                'dark': self.build_qss(self.get_default_variables(True), True),
+            }
+
+        version = self.cache_version()
+        cached = self._read_theme_cache()
+        entry = cached.get(path)
+        if entry and entry.get('version') != version:
+            entry = None
+        # Misma fecha y tamaño: no hace falta ni leer el CSS
+        if entry and entry['mtime'] == mtime and entry['size'] == size:
+            return entry['qss']
+
+        with open(css_file_path, 'rb') as file:
+            raw = file.read()
+        digest = hashlib.sha256(raw).hexdigest()
+
+        # Fecha distinta pero mismo contenido (p. ej. tras un checkout): reutilizar
+        if entry and entry['hash'] == digest:
+            compiled = entry['qss']
+        else:
+            themes = self.parse_css(raw.decode('utf-8'))
+            compiled = {theme: self.build_qss(themes[theme], theme == 'dark') for theme in ('light', 'dark')}
+
+        cached[path] = {'version': version, 'mtime': mtime, 'size': size, 'hash': digest, 'qss': compiled}
+        self._write_theme_cache(cached)
+        return compiled
+
+    def _read_theme_cache(self):
+        try:
+            with open(self.theme_cache_path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_theme_cache(self, cached):
+        temp_path = None
+        try:
+            directory = os.path.dirname(self.theme_cache_path)
+            os.makedirs(directory, exist_ok=True)
+            # Un temporal propio por escritura: varias ventanas pueden guardar a la vez
+            fd, temp_path = tempfile.mkstemp(prefix=".themes-", suffix=".tmp", dir=directory)
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump(cached, file)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, self.theme_cache_path)
+        except OSError as e:
+            print(f"Error guardando caché de estilos: {e}")
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def build_qss(self, variables, dark_mode=False):
         """Genera QSS basado en las variables CSS"""
-        variables = self.load_css_variables(css_file_path, dark_mode)
-        
         # Extraer colores principales
         background = variables.get('background', '#ffffff' if not dark_mode else '#191a1a')
         foreground = variables.get('foreground', '#363a47' if not dark_mode else '#fafbfc')
@@ -139,6 +244,19 @@ class CSSToQSSConverter:
                 outline: none;
             }}
             
+            QComboBox {{
+                background-color: {background};
+                border: 2px solid {border};
+                border-radius: 10px;
+                padding: 8px 16px;
+                color: {foreground};
+                min-width: 200px;
+            }}
+            
+            QComboBox:focus {{
+                border-color: {primary};
+            }}
+            
             QPushButton {{
                 background-color: {primary};
                 color: {primary_foreground};
@@ -187,6 +305,12 @@ class CSSToQSSConverter:
                 font-weight: 500;
             }}
             
+            QLabel#statsLabel {{
+                color: {disabled};
+                font-size: 12px;
+                padding: 0px 4px;
+            }}
+            
             QPushButton#themeToggle {{
                 background-color: {secondary};
                 color: {foreground};
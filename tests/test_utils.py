@@ -0,0 +1,25 @@
+import os
+
+import pytest
+
+from utils import batch_output_paths, collect_audio_files
+
+def test_output_dir_keeps_relative_structure(tmp_path):
+    files = [os.path.join("in", "a", "x.mp3"), os.path.join("in", "b", "x.mp3")]
+    outputs = batch_output_paths(files, str(tmp_path))
+    assert outputs == [os.path.join(str(tmp_path), "a", "x_transcripcion.txt"),
+                       os.path.join(str(tmp_path), "b", "x_transcripcion.txt")]
+
+def test_same_directory_outputs_unchanged(tmp_path):
+    assert batch_output_paths([os.path.join("in", "x.mp3")], str(tmp_path)) == [
+        os.path.join(str(tmp_path), "x_transcripcion.txt")]
+    assert batch_output_paths([os.path.join("in", "x.mp3")]) == [os.path.join("in", "x_transcripcion.txt")]
+
+def test_colliding_outputs_are_rejected():
+    with pytest.raises(ValueError):
+        batch_output_paths([os.path.join("in", "x.mp3"), os.path.join("in", "x.wav")])
+
+def test_repeated_sources_are_collected_once(tmp_path):
+    audio = tmp_path / "x.mp3"
+    audio.write_bytes(b"")
+    assert collect_audio_files([str(tmp_path), str(audio)]) == [os.path.join(str(tmp_path), "x.mp3")]
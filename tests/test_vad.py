@@ -0,0 +1,24 @@
+import numpy as np
+from whisper.audio import SAMPLE_RATE
+
+from vad import split_on_pauses
+
+WINDOW = 30 * SAMPLE_RATE
+
+def room_tone(seconds, level, seed=0):
+    rng = np.random.default_rng(seed)
+    return (level * rng.standard_normal(int(seconds * SAMPLE_RATE))).astype(np.float32)
+
+def test_noise_only_window_yields_no_segments():
+    # Ruido de sala a unos -40 dBFS, muy por encima de MIN_DB
+    assert list(split_on_pauses([room_tone(30, 0.01)], WINDOW)) == []
+
+def test_speech_over_room_tone_is_kept():
+    audio = room_tone(30, 0.01)
+    t = np.arange(4 * SAMPLE_RATE) / SAMPLE_RATE
+    audio[10 * SAMPLE_RATE:14 * SAMPLE_RATE] += 0.4 * np.sin(2 * np.pi * 220 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t))
+    segments = list(split_on_pauses([audio], WINDOW))
+    assert len(segments) == 1
+    start, speech = segments[0]
+    assert 9 * SAMPLE_RATE <= start <= 10 * SAMPLE_RATE
+    assert 4 * SAMPLE_RATE <= len(speech) <= 5 * SAMPLE_RATE
@@ -1,45 +1,222 @@
-from PyQt5.QtCore import QThread, pyqtSignal
-import whisper
-from pydub import AudioSegment
-from utils import write_to_file, remove_temp_files
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+import gc
+import os
+import threading
+from engine import DEFAULT_BACKEND, model_manager, transcribe_file
+from jobs import (JOB_CANCELLED, JOB_DONE, JOB_FAILED, JOB_PAUSED, JOB_QUEUED, JOB_RUNNING, PRIORITY_NORMAL,
+                  JobCancelled, JobControl, JobQueue)
+from batch import transcribe_batch
+from live import transcribe_live, words_text
+from utils import collect_audio_files
 
-# Configuración del modelo Whisper
-model = whisper.load_model("base")
+class TranscriptionThread(QThread):
+    progress = pyqtSignal(int)
+    status_update = pyqtSignal(str)
+    stats = pyqtSignal(dict)  # Instrumentación: factor de tiempo real, ETA, etapas, memoria
 
-def split_audio(file_path):
-    audio = AudioSegment.from_file(file_path)
-    duration = len(audio) // 1000  # Duración en segundos
-    segments = []
+    def __init__(self, file_path, output_path="Transcripcion.txt", control=None, **job_options):
+        super().__init__()
+        self.file_path = file_path
+        self.output_path = output_path
+        self.control = control or JobControl()  # Pausa y cancelación entre lotes
+        # Argumentos de transcribe_file: model_name, backend, batch_size, language, cache_directory...
+        self.job_options = job_options
+        self.cancelled = False
+        self.error = None
 
-    for start in range(0, duration, 30):  # 30 segundos por segmento
-        end = min(start + 30, duration)
-        segment = audio[start*1000:end*1000]  # Convertir a milisegundos
-        segment_path = f"{file_path.rsplit('.', 1)[0]}_segment_{start}-{end}.wav"
-        segment.export(segment_path, format="wav")
-        segments.append(segment_path)
+    def run(self):
+        self.status_update.emit("Transcribiendo")
+        try:
+            transcribe_file(self.file_path, self.output_path, progress_callback=self.progress.emit,
+                            stats_callback=self.stats.emit, control=self.control, **self.job_options)
+        except JobCancelled:
+            self.cancelled = True
+            self.status_update.emit("Cancelado")
+            return
+        except Exception as e:
+            self.error = str(e)
+            self.status_update.emit(f"Error - {e}")
+            return
+        self.status_update.emit("Finalizado")
 
-    return segments
+class JobScheduler(QObject):
+    """Cola de trabajos con prioridades: transcribe un archivo cada vez (el modelo ya usa
+    todos los núcleos) y atiende primero los de mayor prioridad y, a igual prioridad, los
+    más antiguos. El trabajo en curso se puede pausar o cancelar entre lotes"""
+    job_updated = pyqtSignal(int)  # id del trabajo cuyo estado o progreso cambió
+    stats = pyqtSignal(dict)       # Estadísticas en vivo del trabajo en curso
+    idle = pyqtSignal()            # La cola se vació
 
-class TranscriptionThread(QThread):
+    def __init__(self):
+        super().__init__()
+        self.queue = JobQueue()
+        self.jobs = self.queue.jobs
+        self.current = None
+        self.thread = None
+
+    def submit(self, file_path, output_path, priority=PRIORITY_NORMAL, **job_options):
+        job = self.queue.add(file_path, output_path, priority, **job_options)
+        self.job_updated.emit(job.id)
+        self._start_next()
+        return job
+
+    def set_priority(self, job_id, priority):
+        """Cambia la prioridad de un trabajo que aún espera en la cola"""
+        if self.queue.set_priority(job_id, priority):
+            self.job_updated.emit(job_id)
+
+    def pause(self, job_id):
+        job = self.jobs[job_id]
+        if job.state == JOB_RUNNING:
+            job.control.pause()
+            self._set_state(job, JOB_PAUSED)
+
+    def resume(self, job_id):
+        job = self.jobs[job_id]
+        if job.state == JOB_PAUSED:
+            job.control.resume()
+            self._set_state(job, JOB_RUNNING)
+
+    def cancel(self, job_id):
+        job = self.jobs[job_id]
+        if job.state == JOB_QUEUED:
+            self._set_state(job, JOB_CANCELLED)
+        elif job.active:
+            # El hilo termina en el siguiente punto de control; _job_finished libera los recursos
+            job.control.cancel()
+
+    def cancel_all(self):
+        for job_id in list(self.jobs):
+            self.cancel(job_id)
+
+    def is_busy(self):
+        return self.current is not None
+
+    def shutdown(self):
+        """Al cerrar la ventana: cancela la cola y espera al hilo en curso, que se detiene en
+        el siguiente lote"""
+        thread = self.thread
+        self.cancel_all()
+        if thread:
+            thread.wait()
+
+    def _set_state(self, job, state):
+        job.state = state
+        self.job_updated.emit(job.id)
+
+    def _start_next(self):
+        if self.current is not None:
+            return
+        job = self.queue.pop()
+        if job is None:
+            self.idle.emit()
+            return
+        self.current = job
+        self._set_state(job, JOB_RUNNING)
+        self.thread = TranscriptionThread(job.file_path, job.output_path, job.control, **job.job_options)
+        self.thread.progress.connect(lambda percent, job=job: self._job_progress(job, percent))
+        self.thread.stats.connect(self.stats)
+        self.thread.finished.connect(self._job_finished)
+        self.thread.start()
+
+    def _job_progress(self, job, percent):
+        job.progress = percent
+        self.job_updated.emit(job.id)
+
+    def _job_finished(self):
+        job, thread = self.current, self.thread
+        self.current = self.thread = None
+        if thread.cancelled:
+            self._set_state(job, JOB_CANCELLED)
+            self._release_model(job.job_options.get("model_name"), job.job_options.get("backend", DEFAULT_BACKEND))
+        elif thread.error:
+            job.error = thread.error
+            self._set_state(job, JOB_FAILED)
+        else:
+            job.progress = 100
+            self._set_state(job, JOB_DONE)
+        self._start_next()
+
+    def _release_model(self, model_name, backend):
+        """Libera el modelo de un trabajo cancelado si ningún trabajo en cola lo necesita"""
+        if any(job.job_options.get("model_name") == model_name
+               and job.job_options.get("backend", DEFAULT_BACKEND) == backend for job in self.queue.waiting()):
+            return
+        model_manager.release(model_name, backend)
+        gc.collect()
+
+class BatchTranscriptionThread(QThread):
+    """Transcribe una carpeta o lista de archivos repartiéndolos entre procesos"""
     progress = pyqtSignal(int)
+    file_progress = pyqtSignal(str, int)
     status_update = pyqtSignal(str)
 
-    def __init__(self, segments, output_path="Transcripcion.txt"):
+    def __init__(self, sources, output_dir=None, workers=None, threads=None, **job_options):
         super().__init__()
-        self.segments = segments
-        self.output_path = output_path
+        self.sources = sources
+        self.output_dir = output_dir
+        self.workers = workers
+        self.threads = threads
+        self.job_options = job_options
+        self.results = []
 
     def run(self):
-        total_segments = len(self.segments)
-        transcription = ""
+        files = collect_audio_files(self.sources)
+        if not files:
+            self.status_update.emit("Error - No se encontraron archivos de audio")
+            return
 
-        self.status_update.emit("Transcribiendo")
+        file_percents = dict.fromkeys(files, 0)
+
+        def on_progress(file_path, percent):
+            file_percents[file_path] = percent
+            done = sum(1 for value in file_percents.values() if value >= 100)
+            self.file_progress.emit(file_path, percent)
+            self.progress.emit(sum(file_percents.values()) // len(files))
+            self.status_update.emit(f"Transcribiendo ({done}/{len(files)}): {os.path.basename(file_path)}")
 
-        for i, segment_path in enumerate(self.segments):
-            result = model.transcribe(segment_path)
-            transcription += result['text'] + " "
-            self.progress.emit((i + 1) * 100 // total_segments)
+        self.status_update.emit(f"Transcribiendo {len(files)} archivos")
+        try:
+            self.results = transcribe_batch(files, self.output_dir, self.workers, on_progress, threads=self.threads,
+                                            **self.job_options)
+        except ValueError as e:
+            self.status_update.emit(f"Error - {e}")
+            return
 
-        write_to_file(transcription, self.output_path)
+        failed = [file_path for file_path, _, error in self.results if error]
+        if failed:
+            self.status_update.emit(f"Finalizado con {len(failed)} errores")
+        else:
+            self.status_update.emit("Finalizado")
+
+class LiveTranscriptionThread(QThread):
+    """Transcripción en vivo de un archivo que se está grabando: tras cada ventana emite el
+    texto recién confirmado y el provisional. Sigue hasta que el archivo deja de crecer o se
+    llama a stop()"""
+    live_text = pyqtSignal(str, str)  # (texto recién confirmado, texto provisional)
+    status_update = pyqtSignal(str)
+
+    def __init__(self, source, output_path=None, **live_options):
+        super().__init__()
+        self.source = source
+        self.output_path = output_path
+        # Argumentos de transcribe_live: model_name, backend, language, latency
+        self.live_options = live_options
+        self.stop_event = threading.Event()
+
+    def stop(self):
+        """Deja de leer el audio; el texto pendiente se confirma antes de terminar"""
+        self.stop_event.set()
+
+    def run(self):
+        self.status_update.emit("Escuchando")
+        try:
+            transcribe_live(self.source, update_callback=self._on_update, output_path=self.output_path,
+                            stop_event=self.stop_event, **self.live_options)
+        except Exception as e:
+            self.status_update.emit(f"Error - {e}")
+            return
         self.status_update.emit("Finalizado")
-        remove_temp_files(self.segments)
+
+    def _on_update(self, confirmed, partial):
+        self.live_text.emit(words_text(confirmed), words_text(partial))
@@ -0,0 +1,204 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+import torch
+import whisper
+
+from batch import default_workers
+from benchmark import synthesize
+from config_manager import ConfigManager
+from engine import SEGMENT_SECONDS, Segment, available_memory, get_model, prepare_segment, segment_memory
+from model_manager import DEFAULT_MODEL, MODEL_SIZES, model_size
+
+CLIP_SEGMENTS = 8            # Segmentos de 30 s del clip sintético que decodifica cada proceso
+BATCH_SIZES = (1, 2, 4, 8)   # Tamaños de lote candidatos (limitados además por la memoria)
+SAMPLE_TOKENS = 32           # Tokens por segmento: acota el coste del decoder en audio sintético
+STEP_TIMEOUT = 600           # Segundos máximos de cada medición (incluye cargar el modelo)
+TUNE_MEMORY_FRACTION = 0.75  # Fracción de la RAM libre que pueden ocupar los procesos de medición
+PROCESS_OVERHEAD = 300 * 1024 ** 2  # Bytes de cada proceso aparte del modelo (intérprete, torch)
+
+def candidate_layouts(cores=None):
+    """Combinaciones (procesos, hilos de torch) sin sobresuscribir la CPU: para cada número
+    de procesos, todos los núcleos repartidos y la mitad (por si son hilos SMT)"""
+    cores = cores or os.cpu_count() or 1
+    layouts = []
+    workers = 1
+    while workers <= cores:
+        for threads in (cores // workers, cores // workers // 2):
+            if threads >= 1 and (workers, threads) not in layouts:
+                layouts.append((workers, threads))
+        workers *= 2
+    return layouts
+
+def layout_memory(model, workers, batch_size):
+    """Bytes que ocupan `workers` procesos, cada uno con su copia del modelo y un lote"""
+    return workers * (PROCESS_OVERHEAD + model_size(model) + batch_size * segment_memory(model))
+
+def clip_mels(model):
+    """Log-mel de un clip sintético de voz y silencios, apilado para decodificar por lotes"""
+    audio = synthesize("bursts", CLIP_SEGMENTS * SEGMENT_SECONDS)
+    window = SEGMENT_SECONDS * whisper.audio.SAMPLE_RATE
+    segments = [Segment(i, i * SEGMENT_SECONDS, (i + 1) * SEGMENT_SECONDS, audio[i * window:(i + 1) * window])
+                for i in range(CLIP_SEGMENTS)]
+    return torch.stack([prepare_segment(segment, model.dims.n_mels) for segment in segments]).to(model.device)
+
+def _measure_worker(model_name, threads, batch_sizes, barrier):
+    """Proceso de medición: todos los procesos decodifican el clip a la vez con cada tamaño
+    de lote; la barrera marca al proceso principal el inicio y el fin de cada ronda"""
+    torch.set_num_threads(threads)
+    model = get_model(model_name)
+    mels = clip_mels(model)
+    options = whisper.DecodingOptions(language="en", fp16=False, without_timestamps=True, sample_len=SAMPLE_TOKENS)
+    model.decode(mels[:1], options)  # Calentamiento: la primera llamada reserva memoria
+    for batch_size in batch_sizes:
+        barrier.wait(STEP_TIMEOUT)
+        for start in range(0, len(mels), batch_size):
+            model.decode(mels[start:start + batch_size], options)
+        barrier.wait(STEP_TIMEOUT)
+
+def measure(model_name, workers, threads, batch_sizes):
+    """Mide el rendimiento agregado (segundos de audio por segundo) de `workers` procesos
+    con `threads` hilos cada uno. Devuelve {tamaño de lote: veces tiempo real}"""
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers + 1)
+    processes = [context.Process(target=_measure_worker, args=(model_name, threads, batch_sizes, barrier),
+                                 daemon=True) for _ in range(workers)]
+    for process in processes:
+        process.start()
+
+    speeds = {}
+    try:
+        for batch_size in batch_sizes:
+            barrier.wait(STEP_TIMEOUT)
+            start = time.perf_counter()
+            barrier.wait(STEP_TIMEOUT)
+            speeds[batch_size] = workers * CLIP_SEGMENTS * SEGMENT_SECONDS / (time.perf_counter() - start)
+    except threading.BrokenBarrierError:
+        # Un proceso falló o se quedó sin memoria: se conservan las rondas completas
+        barrier.abort()
+    finally:
+        for process in processes:
+            process.join(1)
+            if process.is_alive():
+                process.terminate()
+    return speeds
+
+def tune(model_name=DEFAULT_MODEL, log=print):
+    """Prueba las combinaciones de procesos, hilos y tamaño de lote sobre un clip sintético
+    y devuelve el perfil más rápido para un solo archivo y para lotes de archivos"""
+    cores = os.cpu_count() or 1
+    model = get_model(model_name)
+    if model.device.type != "cpu":
+        # En GPU la CPU sólo prepara el audio: un proceso, hilos y lote automáticos
+        best = {"workers": 1, "threads": 0, "batch_size": 0, "x_realtime": None}
+        return {"cpu_count": cores, "single": best, "parallel": best, "results": []}
+
+    # Cada proceso carga su propia copia del modelo: sólo se prueban las combinaciones que
+    # caben en la RAM libre (sin poder consultarla, sólo un proceso). Un proceso con lotes
+    # de 1 se mide siempre, porque es lo mínimo que necesita cualquier transcripción
+    free = available_memory()
+    usable = free * TUNE_MEMORY_FRACTION if free is not None else 0
+    results = []
+    for workers, threads in candidate_layouts(cores):
+        batch_sizes = [size for size in BATCH_SIZES if layout_memory(model, workers, size) <= usable]
+        if workers == 1 and not batch_sizes:
+            batch_sizes = [1]
+        if not batch_sizes:
+            log(f"Se omiten {workers} proceso(s) x {threads} hilo(s): no caben en la memoria libre")
+            continue
+        log(f"Midiendo {workers} proceso(s) x {threads} hilo(s), lotes {batch_sizes}...")
+        for batch_size, speed in measure(model_name, workers, threads, batch_sizes).items():
+            results.append({"workers": workers, "threads": threads, "batch_size": batch_size, "x_realtime": speed})
+    if not results:
+        raise RuntimeError("No se pudo completar ninguna medición")
+
+    def fastest(rows):
+        return max(rows, key=lambda row: row["x_realtime"])
+
+    return {
+        "cpu_count": cores,
+        "single": fastest([row for row in results if row["workers"] == 1]),
+        "parallel": fastest(results),
+        "results": results,
+    }
+
+def current_profile(config, model_name):
+    """Perfil medido para el modelo en esta máquina; si falta, el de otro modelo (los hilos
+    y procesos dependen sobre todo del equipo). None si nunca se midió aquí"""
+    candidates = [config.get_tuned_profile(model_name)]
+    candidates += [config.get_tuned_profile(name) for name in MODEL_SIZES if name != model_name]
+    for profile in candidates:
+        if profile and profile.get("cpu_count") == os.cpu_count():
+            return profile
+    return None
+
+def needs_tuning(config, model_name):
+    # Con hilos, lote y procesos fijados a mano no hay nada que ajustar
+    if config.get_threads() and config.get_batch_size() and config.get_workers():
+        return False
+    profile = config.get_tuned_profile(model_name)
+    return not profile or profile.get("cpu_count") != os.cpu_count()
+
+def ensure_profile(config, model_name, log=print):
+    """Mide y guarda el perfil del modelo la primera vez que se usa en esta máquina"""
+    if needs_tuning(config, model_name):
+        log("Ajustando el rendimiento a este equipo (sólo la primera vez)...")
+        config.set_tuned_profile(model_name, tune(model_name, log))
+        config.flush()
+    return config.get_tuned_profile(model_name)
+
+def resources(config, model_name, parallel=False):
+    """Procesos, hilos de torch y tamaño de lote para un trabajo. Los valores fijados a mano
+    en la configuración (distintos de 0) mandan sobre el perfil medido"""
+    profile = current_profile(config, model_name)
+    tuned = dict(profile["parallel" if parallel else "single"]) if profile else {}
+    if profile and profile is not config.get_tuned_profile(model_name):
+        tuned.pop("batch_size", None)  # El lote medido con otro modelo no sirve para este
+
+    workers = 1
+    if parallel:
+        workers = config.get_workers() or tuned.get("workers") or default_workers()
+    threads = config.get_threads()
+    if not threads and tuned.get("workers") == workers:
+        threads = tuned.get("threads")
+    if not threads and parallel:
+        threads = max(1, (os.cpu_count() or 1) // workers)
+    return {
+        "workers": workers,
+        "threads": threads or 0,
+        "batch_size": config.get_batch_size() or tuned.get("batch_size") or None,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m tuner",
+                                     description="Mide la mejor combinación de procesos, hilos y lote para este equipo")
+    parser.add_argument("-m", "--model", choices=MODEL_SIZES, help="Modelo a medir (por defecto, el configurado)")
+    parser.add_argument("--show", action="store_true", help="Mostrar el perfil guardado sin volver a medir")
+    args = parser.parse_args(argv)
+
+    config = ConfigManager()
+    model_name = args.model or config.get_model() or DEFAULT_MODEL
+    if args.show:
+        profile = config.get_tuned_profile(model_name)
+        if not profile:
+            print(f"No hay perfil medido para '{model_name}'")
+            return 1
+    else:
+        profile = tune(model_name)
+        config.set_tuned_profile(model_name, profile)
+        config.flush()
+
+    for row in profile["results"]:
+        print(f"{row['workers']:>3} procesos  {row['threads']:>3} hilos  lote {row['batch_size']:>2}  "
+              f"{row['x_realtime']:8.2f}x tiempo real")
+    for name, label in (("single", "Un archivo"), ("parallel", "Por lotes")):
+        best = profile[name]
+        print(f"{label}: {best['workers']} proceso(s), {best['threads']} hilo(s), lote {best['batch_size']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
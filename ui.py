@@ -1,27 +1,154 @@
-from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QLineEdit, QFileDialog, QProgressBar)
-from PyQt5.QtCore import Qt
-from transcription import TranscriptionThread, split_audio
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QLineEdit, QFileDialog, QProgressBar,
+                             QComboBox, QListWidget, QListWidgetItem, QTextEdit)
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal
 from style_loader import CSSToQSSConverter
 from config_manager import ConfigManager
+from model_manager import DEFAULT_BACKEND, DEFAULT_MODEL
+from service_client import ServiceClient, ServiceError
+from startup import StartupTimer
+from utils import batch_output_paths, collect_audio_files, default_output_path
+import html
 import os
+import re
+import sqlite3
+
+# Idiomas ofrecidos en la interfaz; None deja que Whisper lo detecte en el primer segmento con voz
+LANGUAGES = [
+    ("Detectar automáticamente", None),
+    ("Español", "es"),
+    ("Inglés", "en"),
+    ("Portugués", "pt"),
+    ("Francés", "fr"),
+    ("Alemán", "de"),
+    ("Italiano", "it"),
+]
+
+# Modelos seleccionables: de más rápido a más preciso
+MODELS = ["tiny", "base", "small", "medium"]
+
+# Motores de inferencia (backends.py): nombre en la interfaz y clave del motor
+BACKENDS = [
+    ("Precisión completa (fp32)", "fp32"),
+    ("Rápido en CPU (int8)", "int8"),
+]
+
+# Prioridades de la cola de trabajos (el número menor se atiende antes)
+PRIORITIES = [("Alta", 0), ("Normal", 1), ("Baja", 2)]
+
+class EngineLoader(QThread):
+    """Importa el motor de transcripción (whisper, torch) y precarga el modelo en segundo
+    plano, para que la ventana aparezca sin esperar a las importaciones pesadas. La primera
+    vez mide además el rendimiento del equipo (tuner.py) antes de habilitar la transcripción"""
+    ready = pyqtSignal()
+    failed = pyqtSignal(str)
+    status = pyqtSignal(str)
+
+    def __init__(self, model_name, backend, startup_timer, config_manager):
+        super().__init__()
+        self.model_name = model_name
+        self.backend = backend
+        self.startup_timer = startup_timer
+        self.config_manager = config_manager
+
+    def run(self):
+        try:
+            with self.startup_timer.phase("engine_import"):
+                import torch
+                import transcription  # noqa: F401
+                from engine import model_manager
+                from tuner import ensure_profile, resources
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        try:
+            with self.startup_timer.phase("tuning"):
+                ensure_profile(self.config_manager, self.model_name, log=self.status.emit)
+        except Exception as e:
+            print(f"Error ajustando el rendimiento: {e}")
+        threads = resources(self.config_manager, self.model_name)["threads"]
+        if threads:
+            torch.set_num_threads(threads)
+        model_manager.set_memory_budget(self.config_manager.get_model_memory_budget() * 1024 ** 2)
+        self.ready.emit()
+
+        with self.startup_timer.phase("model_load"):
+            model_manager.get(self.model_name, self.backend)
 
 class Transcribineitor(QWidget):
-    def __init__(self):
+    def __init__(self, startup_timer=None):
         super().__init__()
-        self.config_manager = ConfigManager()
-        
-        # Cargar la preferencia del tema guardada
-        self.dark_mode = self.config_manager.get_dark_mode()
+        self.startup_timer = startup_timer or StartupTimer()
+        self.engine_ready = False
+        self.scheduler = None  # Cola de trabajos; se crea al cargar el motor o conectar con el servicio
+        self.service = None  # Cliente del servicio local si la ventana actúa sólo como cliente
+        self.batch_running = False
+        self.live_thread = None  # Transcripción en vivo en curso
+        self.live_confirmed = ""
+
+        with self.startup_timer.phase("config_load"):
+            self.config_manager = ConfigManager()
+            # Cargar la preferencia del tema guardada
+            self.dark_mode = self.config_manager.get_dark_mode()
         
         self.init_ui()
-        self.apply_styles()
+        with self.startup_timer.phase("qss"):
+            self.style_converter = CSSToQSSConverter()
+            self.apply_styles()
         
         # Actualizar el texto del botón según el tema cargado
         self.update_theme_button_text()
 
+        # Cargar el motor y el modelo en segundo plano cuando la ventana ya esté visible
+        self.set_buttons_enabled(False)
+        self.status_label.setText("Estado: Cargando motor de transcripción...")
+        QTimer.singleShot(0, self.load_engine)
+
+    def load_engine(self):
+        # Con el servicio local en marcha no hace falta importar torch ni cargar ningún modelo
+        service_url = self.config_manager.get_service_url()
+        if service_url:
+            client = ServiceClient(service_url, timeout=2)
+            if client.available():
+                self.service_connected(client)
+                return
+            self.status_label.setText("Estado: Servicio no disponible, cargando motor local...")
+
+        self.engine_loader = EngineLoader(self.model_combo.currentText(), self.backend_combo.currentData(),
+                                          self.startup_timer, self.config_manager)
+        self.engine_loader.ready.connect(self.engine_loaded)
+        self.engine_loader.status.connect(self.update_status)
+        self.engine_loader.failed.connect(self.engine_failed)
+        self.engine_loader.finished.connect(self.startup_timer.print_report)
+        self.engine_loader.start()
+
+    def engine_loaded(self):
+        from transcription import JobScheduler
+
+        self.engine_ready = True
+        self.attach_scheduler(JobScheduler())
+        self.status_label.setText("Estado: No Iniciado")
+
+    def service_connected(self, client):
+        from remote import RemoteJobScheduler
+
+        self.service = client
+        self.attach_scheduler(RemoteJobScheduler(client))
+        self.status_label.setText(f"Estado: Conectado al servicio {client.url}")
+        self.startup_timer.print_report()
+
+    def attach_scheduler(self, scheduler):
+        self.scheduler = scheduler
+        self.scheduler.job_updated.connect(self.job_updated)
+        self.scheduler.stats.connect(self.update_stats)
+        self.scheduler.idle.connect(self.queue_finished)
+        self.set_buttons_enabled(True)
+
+    def engine_failed(self, error):
+        self.status_label.setText(f"Estado: Error - No se pudo cargar el motor de transcripción: {error}")
+
     def init_ui(self):
         self.setWindowTitle("Transcribineitor 3000")
-        self.setGeometry(300, 300, 700, 400)
+        self.setGeometry(300, 300, 700, 560)
 
         layout = QVBoxLayout()
         layout.setSpacing(20)
@@ -38,6 +165,12 @@ class Transcribineitor(QWidget):
         
         # Espaciador
         header_layout.addStretch()
+
+        # Botón del panel de búsqueda en el archivo de transcripciones
+        self.search_toggle_button = QPushButton("🔎 Buscar", self)
+        self.search_toggle_button.setCheckable(True)
+        self.search_toggle_button.toggled.connect(self.toggle_search_panel)
+        header_layout.addWidget(self.search_toggle_button)
         
         # Botón de cambio de tema
         self.theme_toggle_button = QPushButton("🌙 Modo Oscuro", self)
@@ -47,6 +180,27 @@ class Transcribineitor(QWidget):
         
         layout.addLayout(header_layout)
 
+        # Búsqueda en todas las transcripciones archivadas, con tiempos de cada frase
+        self.search_panel = QWidget(self)
+        search_layout = QVBoxLayout(self.search_panel)
+        search_layout.setContentsMargins(0, 0, 0, 0)
+        search_layout.setSpacing(10)
+        query_layout = QHBoxLayout()
+        query_layout.setSpacing(10)
+        self.search_entry = QLineEdit(self)
+        self.search_entry.setPlaceholderText('Buscar en todas las transcripciones ("frase exacta", prefijo*)...')
+        self.search_entry.returnPressed.connect(self.search_archive)
+        query_layout.addWidget(self.search_entry)
+        self.search_button = QPushButton("Buscar", self)
+        self.search_button.clicked.connect(self.search_archive)
+        query_layout.addWidget(self.search_button)
+        search_layout.addLayout(query_layout)
+        self.search_results = QListWidget(self)
+        self.search_results.setObjectName("searchResults")
+        search_layout.addWidget(self.search_results)
+        self.search_panel.hide()
+        layout.addWidget(self.search_panel)
+
         # Grupo de selección de archivo
         file_layout = QHBoxLayout()
         file_layout.setSpacing(10)
@@ -73,19 +227,86 @@ class Transcribineitor(QWidget):
         output_layout.addWidget(self.output_select_button)
         layout.addLayout(output_layout)
 
+        # Idioma del audio y modelo
+        language_layout = QHBoxLayout()
+        language_layout.setSpacing(10)
+        self.language_label = QLabel("Idioma:", self)
+        self.language_combo = QComboBox(self)
+        for name, code in LANGUAGES:
+            self.language_combo.addItem(name, code)
+        language_layout.addWidget(self.language_label)
+        language_layout.addWidget(self.language_combo)
+        language_layout.addStretch()
+        self.model_label = QLabel("Modelo:", self)
+        self.model_combo = QComboBox(self)
+        self.model_combo.addItems(MODELS)
+        self.model_combo.setCurrentText(self.config_manager.get_model() or DEFAULT_MODEL)
+        self.model_combo.currentTextChanged.connect(self.model_changed)
+        language_layout.addWidget(self.model_label)
+        language_layout.addWidget(self.model_combo)
+        self.backend_combo = QComboBox(self)
+        for name, backend in BACKENDS:
+            self.backend_combo.addItem(name, backend)
+        self.backend_combo.setCurrentIndex(
+            max(0, self.backend_combo.findData(self.config_manager.get_backend() or DEFAULT_BACKEND))
+        )
+        self.backend_combo.currentIndexChanged.connect(self.backend_changed)
+        language_layout.addWidget(self.backend_combo)
+        layout.addLayout(language_layout)
+
         # Botones de acción
         button_layout = QHBoxLayout()
         button_layout.setSpacing(10)
-        self.start_button = QPushButton("Iniciar Transcripción", self)
+        self.start_button = QPushButton("Añadir a la cola", self)
         self.start_button.clicked.connect(self.start_transcription)
         button_layout.addWidget(self.start_button)
+        self.priority_combo = QComboBox(self)
+        for name, priority in PRIORITIES:
+            self.priority_combo.addItem(f"Prioridad {name.lower()}", priority)
+        self.priority_combo.setCurrentIndex(1)
+        button_layout.addWidget(self.priority_combo)
+        self.batch_button = QPushButton("Transcribir carpeta...", self)
+        self.batch_button.clicked.connect(self.start_batch_transcription)
+        button_layout.addWidget(self.batch_button)
+        self.live_button = QPushButton("En vivo", self)
+        self.live_button.setToolTip("Transcribir el archivo seleccionado mientras se graba")
+        self.live_button.clicked.connect(self.toggle_live)
+        button_layout.addWidget(self.live_button)
         layout.addLayout(button_layout)
 
+        # Cola de trabajos: estado de cada archivo y controles del seleccionado
+        self.jobs_list = QListWidget(self)
+        self.jobs_list.setObjectName("jobsList")
+        self.jobs_list.currentItemChanged.connect(self.update_job_buttons)
+        layout.addWidget(self.jobs_list)
+        job_buttons_layout = QHBoxLayout()
+        job_buttons_layout.setSpacing(10)
+        self.pause_button = QPushButton("Pausar", self)
+        self.pause_button.clicked.connect(self.toggle_pause)
+        job_buttons_layout.addWidget(self.pause_button)
+        self.cancel_button = QPushButton("Cancelar", self)
+        self.cancel_button.clicked.connect(self.cancel_job)
+        job_buttons_layout.addWidget(self.cancel_button)
+        job_buttons_layout.addStretch()
+        layout.addLayout(job_buttons_layout)
+        self.update_job_buttons()
+
         # Barra de progreso y estado
         self.progress_bar = QProgressBar(self)
         layout.addWidget(self.progress_bar)
         self.status_label = QLabel("Estado: No Iniciado", self)
         layout.addWidget(self.status_label)
+        self.stats_label = QLabel("", self)
+        self.stats_label.setObjectName("statsLabel")
+        self.stats_label.hide()
+        layout.addWidget(self.stats_label)
+
+        # Texto del modo en vivo: lo confirmado y, atenuado, lo provisional
+        self.live_text = QTextEdit(self)
+        self.live_text.setObjectName("liveText")
+        self.live_text.setReadOnly(True)
+        self.live_text.hide()
+        layout.addWidget(self.live_text)
 
         # Botón de cerrar
         self.close_button = QPushButton("Cerrar", self)
@@ -99,9 +320,9 @@ class Transcribineitor(QWidget):
         # Obtener la ruta del archivo CSS
         css_file_path = os.path.join(os.path.dirname(__file__), 'styles.css')
         
-        # Crear el convertidor y generar QSS
-        converter = CSSToQSSConverter()
-        qss = converter.generate_qss(css_file_path, self.dark_mode)
+        # Generar QSS; el convertidor conserva los temas compilados, así que cambiar de tema
+        # no vuelve a leer el CSS
+        qss = self.style_converter.generate_qss(css_file_path, self.dark_mode)
         
         # Aplicar los estilos
         self.setStyleSheet(qss)
@@ -109,6 +330,67 @@ class Transcribineitor(QWidget):
         # Aplicar ID específico para el label de estado
         self.status_label.setObjectName("statusLabel")
 
+    def model_changed(self, model_name):
+        self.config_manager.set_model(model_name)
+        self.prewarm_model()
+
+    def backend_changed(self):
+        self.config_manager.set_backend(self.backend_combo.currentData())
+        self.prewarm_model()
+
+    def job_options(self, parallel=False):
+        """Opciones del motor para un trabajo: las elegidas en la ventana, las de configuración
+        y el tamaño de lote del perfil de rendimiento (con el servicio, éste usa los suyos)"""
+        model_name = self.model_combo.currentText()
+        options = {
+            "model_name": model_name,
+            "language": self.language_combo.currentData(),
+            "backend": self.backend_combo.currentData(),
+        }
+        if self.service is None:
+            from tuner import resources
+
+            options["batch_size"] = resources(self.config_manager, model_name, parallel)["batch_size"]
+            options["cache_directory"] = self.config_manager.get_cache_directory() or None
+            options["archive_directory"] = self.config_manager.get_archive_directory() or None
+        return options
+
+    def prewarm_model(self):
+        """Carga en segundo plano el modelo seleccionado para que la transcripción empiece antes"""
+        if not self.engine_ready or self.service:
+            return  # EngineLoader cargará el modelo al terminar de importar; el servicio ya los tiene
+        from engine import model_manager
+        model_manager.prewarm(self.model_combo.currentText(), self.backend_combo.currentData())
+
+    def toggle_search_panel(self, visible):
+        self.search_panel.setVisible(visible)
+        if visible:
+            self.search_entry.setFocus()
+
+    def search_archive(self):
+        """Busca en el archivo de transcripciones y lista cada frase con su audio y sus tiempos"""
+        from archive import TranscriptArchive, format_times
+
+        query = self.search_entry.text().strip()
+        self.search_results.clear()
+        if not query:
+            return
+        try:
+            archive = TranscriptArchive(self.config_manager.get_archive_directory() or None)
+            try:
+                hits = archive.search(query)
+            finally:
+                archive.close()
+        except sqlite3.Error as e:
+            self.status_label.setText(f"Estado: Error - No se pudo consultar el archivo: {e}")
+            return
+        for hit in hits:
+            item = QListWidgetItem(f"{os.path.basename(hit['source_path'])}  [{format_times(hit)}]  {hit['snippet']}")
+            item.setToolTip(f"{hit['text']}\n\nAudio: {hit['source_path']}\nTranscripción: {hit['output_path'] or '-'}")
+            self.search_results.addItem(item)
+        if not hits:
+            self.search_results.addItem("Sin resultados")
+
     def toggle_theme(self):
         """Cambia entre modo claro y oscuro"""
         self.dark_mode = not self.dark_mode
@@ -163,13 +445,18 @@ class Transcribineitor(QWidget):
             else:
                 initial_dir = os.getcwd()
             
-        file_path, _ = QFileDialog.getSaveFileName(
+        file_path, selected_filter = QFileDialog.getSaveFileName(
             self,
             "Guardar transcripción como",
             initial_dir,
-            "Archivos de texto (*.txt);;Archivos de subtítulos (*.srt);;Todos los archivos (*)"
+            "Archivos de texto (*.txt);;Subtítulos SRT (*.srt);;Subtítulos WebVTT (*.vtt);;"
+            "JSON lines con tiempos (*.jsonl);;Todos los archivos (*)"
         )
         if file_path:
+            # El formato sale de la extensión: si falta, se toma la del filtro elegido
+            extension = re.search(r"\*\.(\w+)", selected_filter)
+            if not os.path.splitext(file_path)[1] and extension:
+                file_path = f"{file_path}.{extension.group(1)}"
             self.output_path_entry.setText(file_path)
             
             # Guardar el directorio de salida para la próxima vez
@@ -179,13 +466,8 @@ class Transcribineitor(QWidget):
     def suggest_output_filename(self, audio_path):
         """Sugiere automáticamente un nombre para el archivo de transcripción"""
         if audio_path:
-            # Obtener el nombre del archivo sin extensión
-            base_name = os.path.splitext(os.path.basename(audio_path))[0]
-            # Obtener el directorio del archivo de audio
-            audio_dir = os.path.dirname(audio_path)
-            # Crear el nombre sugerido
-            suggested_name = os.path.join(audio_dir, f"{base_name}_transcripcion.txt")
-            self.output_path_entry.setText(suggested_name)
+            # <nombre>_transcripcion.txt en el mismo directorio que el audio
+            self.output_path_entry.setText(default_output_path(audio_path))
 
     def start_transcription(self):
         file_path = self.file_path_entry.text()
@@ -205,35 +487,223 @@ class Transcribineitor(QWidget):
             self.status_label.setText("Estado: Error - El directorio de salida no existe")
             return
         
-        # Dividir el audio en segmentos
-        self.status_label.setText("Estado: Dividiendo audio...")
-        segments = split_audio(file_path)
-        
-        # Iniciar el hilo de transcripción con la ruta de salida personalizada
-        self.transcription_thread = TranscriptionThread(segments, output_path)
-        self.transcription_thread.progress.connect(self.progress_bar.setValue)
-        self.transcription_thread.status_update.connect(self.update_status)
-        self.transcription_thread.finished.connect(self.transcription_finished)
-        self.transcription_thread.start()
-        
-        # Deshabilitar botones durante la transcripción
-        self.start_button.setEnabled(False)
-        self.select_button.setEnabled(False)
-        self.output_select_button.setEnabled(False)
+        # Encolar el trabajo; el audio se decodifica en streaming dentro del hilo de transcripción
+        self.submit_job(file_path, output_path)
+
+    def submit_job(self, file_path, output_path):
+        try:
+            self.scheduler.submit(file_path, output_path, self.priority_combo.currentData(), **self.job_options())
+        except ServiceError as e:
+            self.status_label.setText(f"Estado: Error - {e}")
+
+    def start_batch_transcription(self):
+        """Transcribe todos los audios de una carpeta en paralelo; cada transcripción
+        se guarda junto a su audio con el nombre sugerido"""
+        from transcription import BatchTranscriptionThread
+
+        initial_dir = self.config_manager.get_last_audio_directory()
+        if not initial_dir or not os.path.exists(initial_dir):
+            initial_dir = os.getcwd()
+
+        directory = QFileDialog.getExistingDirectory(self, "Seleccionar carpeta de audios", initial_dir)
+        if not directory:
+            return
+
+        self.config_manager.set_last_audio_directory(directory)
+
+        if self.service:
+            # El servicio encola cada archivo y los transcribe uno tras otro con el modelo ya cargado
+            files = collect_audio_files(directory)
+            if not files:
+                self.status_label.setText("Estado: Error - No se encontraron archivos de audio")
+                return
+            try:
+                output_paths = batch_output_paths(files)
+            except ValueError as e:
+                self.status_label.setText(f"Estado: Error - {e}")
+                return
+            for file_path, output_path in zip(files, output_paths):
+                self.submit_job(file_path, output_path)
+            return
+
+        self.status_label.setText("Estado: Preparando transcripción por lotes...")
+        self.progress_bar.setValue(0)
+        from tuner import resources
+
+        plan = resources(self.config_manager, self.model_combo.currentText(), parallel=True)
+        self.batch_thread = BatchTranscriptionThread(directory, workers=plan["workers"], threads=plan["threads"],
+                                                     **self.job_options(parallel=True))
+        self.batch_thread.progress.connect(self.progress_bar.setValue)
+        self.batch_thread.status_update.connect(self.update_status)
+        self.batch_thread.finished.connect(self.batch_transcription_finished)
+        self.batch_thread.start()
+
+        self.batch_running = True
+        self.set_buttons_enabled(False)
+
+    def batch_transcription_finished(self):
+        results = self.batch_thread.results
+        failed = sum(1 for _, _, error in results if error)
+        if results:
+            self.status_label.setText(
+                f"Estado: Lote completado - {len(results) - failed} archivos transcritos, {failed} con errores"
+            )
+        self.batch_running = False
+        self.set_buttons_enabled(True)
+
+    def set_buttons_enabled(self, enabled):
+        self.start_button.setEnabled(enabled)
+        # El lote reparte los archivos entre procesos: no se mezcla con la cola en curso
+        self.batch_button.setEnabled(enabled and not (self.scheduler and self.scheduler.is_busy()))
+        self.update_live_button()
+        self.select_button.setEnabled(enabled)
+        self.output_select_button.setEnabled(enabled)
+        self.language_combo.setEnabled(enabled)
+        self.model_combo.setEnabled(enabled)
+        self.backend_combo.setEnabled(enabled)
 
     def update_status(self, text):
         self.status_label.setText(f"Estado: {text}")
 
-    def transcription_finished(self):
-        output_path = self.output_path_entry.text()
-        filename = os.path.basename(output_path) if output_path else "archivo"
-        self.status_label.setText(f"Estado: Transcripción completada y guardada como '{filename}'")
-        
-        # Reactivar botones
-        self.start_button.setEnabled(True)
-        self.select_button.setEnabled(True)
-        self.output_select_button.setEnabled(True)
-        self.progress_bar.setValue(100)
+    def update_stats(self, stats):
+        """Muestra el factor de tiempo real, la ETA y el pico de memoria del trabajo en curso"""
+        parts = []
+        if stats["rtf"] is not None:
+            parts.append(f"Tiempo real: {stats['rtf']:.2f}x")
+        if stats["eta"] is not None:
+            minutes, seconds = divmod(int(stats["eta"]), 60)
+            parts.append(f"Restante: {minutes}:{seconds:02d}")
+        parts.append(f"Segmentos: {stats['segments']}")
+        if stats["peak_rss"]:
+            parts.append(f"Memoria: {stats['peak_rss'] / 1024 ** 2:.0f} MB")
+        self.stats_label.setText("  ·  ".join(parts))
+        self.stats_label.show()
+
+    def job_updated(self, job_id):
+        """Refleja en la lista el estado y el progreso de un trabajo de la cola"""
+        job = self.scheduler.jobs[job_id]
+        item = self.job_item(job_id)
+        if item is None:
+            item = QListWidgetItem()
+            item.setData(Qt.UserRole, job_id)
+            self.jobs_list.addItem(item)
+        text = f"{os.path.basename(job.file_path)} — {job.state}"
+        if job.active:
+            text += f" ({job.progress}%)"
+        elif job.error:
+            text += f": {job.error}"
+        item.setText(text)
+
+        if job is self.scheduler.current:
+            self.progress_bar.setValue(job.progress)
+            self.status_label.setText(f"Estado: {job.state} '{os.path.basename(job.file_path)}'")
+        elif job.completed:
+            self.progress_bar.setValue(100)
+            self.status_label.setText(
+                f"Estado: Transcripción completada y guardada como '{os.path.basename(job.output_path)}'"
+            )
+        elif job.finished:
+            self.status_label.setText(f"Estado: {job.state} '{os.path.basename(job.file_path)}'")
+        self.batch_button.setEnabled(not self.batch_running and not self.scheduler.is_busy())
+        self.update_live_button()
+        if item is self.jobs_list.currentItem():
+            self.update_job_buttons()
+
+    def job_item(self, job_id):
+        for row in range(self.jobs_list.count()):
+            item = self.jobs_list.item(row)
+            if item.data(Qt.UserRole) == job_id:
+                return item
+        return None
+
+    def selected_job(self):
+        item = self.jobs_list.currentItem()
+        if item is None or self.scheduler is None:
+            return None
+        return self.scheduler.jobs[item.data(Qt.UserRole)]
+
+    def update_job_buttons(self, *args):
+        job = self.selected_job()
+        self.pause_button.setText("Reanudar" if job and job.paused else "Pausar")
+        self.pause_button.setEnabled(bool(job) and job.active)
+        self.cancel_button.setEnabled(bool(job) and not job.finished)
+
+    def toggle_pause(self):
+        job = self.selected_job()
+        if job is None:
+            return
+        if job.paused:
+            self.scheduler.resume(job.id)
+        else:
+            self.scheduler.pause(job.id)
+
+    def cancel_job(self):
+        job = self.selected_job()
+        if job is not None:
+            self.scheduler.cancel(job.id)
+
+    def queue_finished(self):
+        self.batch_button.setEnabled(not self.batch_running)
+        self.update_live_button()
+
+    def update_live_button(self):
+        # El modo en vivo usa el modelo local: no se mezcla con la cola, el lote ni el servicio
+        if self.live_thread is not None:
+            return
+        self.live_button.setEnabled(self.engine_ready and self.service is None and not self.batch_running
+                                    and not (self.scheduler and self.scheduler.is_busy()))
+
+    def toggle_live(self):
+        """Empieza a transcribir en vivo el archivo seleccionado (que puede seguir grabándose),
+        o lo detiene confirmando el texto pendiente"""
+        if self.live_thread is not None:
+            self.live_thread.stop()
+            self.live_button.setEnabled(False)
+            return
+        from transcription import LiveTranscriptionThread
+
+        file_path = self.file_path_entry.text()
+        if not file_path or not os.path.exists(file_path):
+            self.status_label.setText("Estado: Error - No se ha seleccionado ningún archivo de audio")
+            return
+
+        self.live_confirmed = ""
+        self.live_text.clear()
+        self.live_text.show()
+        self.live_thread = LiveTranscriptionThread(
+            file_path, self.output_path_entry.text() or None,
+            model_name=self.model_combo.currentText(),
+            backend=self.backend_combo.currentData(),
+            language=self.language_combo.currentData(),
+            latency=self.config_manager.get_live_latency(),
+        )
+        self.live_thread.live_text.connect(self.show_live_text)
+        self.live_thread.status_update.connect(self.update_status)
+        self.live_thread.finished.connect(self.live_finished)
+        self.live_thread.start()
+        self.set_buttons_enabled(False)
+        self.live_button.setText("Detener")
+        self.live_button.setEnabled(True)
+
+    def show_live_text(self, confirmed, partial):
+        if confirmed:
+            self.live_confirmed = f"{self.live_confirmed} {confirmed}".strip()
+        self.live_text.setHtml(f'{html.escape(self.live_confirmed)} <span style="color: gray;">'
+                               f'{html.escape(partial)}</span>')
+        self.live_text.verticalScrollBar().setValue(self.live_text.verticalScrollBar().maximum())
+
+    def live_finished(self):
+        self.live_thread = None
+        self.live_button.setText("En vivo")
+        self.set_buttons_enabled(True)
+
+    def closeEvent(self, event):
+        if self.live_thread:
+            self.live_thread.stop()
+            self.live_thread.wait()
+        if self.scheduler:
+            self.scheduler.shutdown()
+        super().closeEvent(event)
 
     def close_program(self):
         self.close()
@@ -1,9 +1,122 @@
+import json
 import os
 
-def write_to_file(text, output_path="Transcripcion.txt"):
-    with open(output_path, "w", encoding="utf-8") as file:
-        file.write(text)
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".m4a", ".flac", ".ogg")
 
-def remove_temp_files(segments):
-    for segment in segments:
-        os.remove(segment)
+class TranscriptJournal:
+    """Diario append-only de los segmentos transcritos de un archivo. Cada línea JSON registra
+    un segmento completado; tras una interrupción, el diario indica dónde reanudar"""
+
+    def __init__(self, output_path, identity):
+        self.output_path = output_path
+        self.path = f"{output_path}.journal"
+        self.identity = identity
+        self.file = None
+
+    def _scan(self):
+        """Recorre el diario y devuelve (compatible, última entrada, bytes válidos) sin
+        cargarlo en memoria. Una última línea truncada por un cierre inesperado se descarta"""
+        last_entry = None
+        with open(self.path, "rb") as file:
+            header = file.readline()
+            try:
+                if json.loads(header).get("identity") != self.identity:
+                    return False, None, 0
+            except ValueError:
+                return False, None, 0
+            valid_bytes = len(header)
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    last_entry = json.loads(line)
+                except ValueError:
+                    break
+                valid_bytes += len(line)
+        return True, last_entry, valid_bytes
+
+    def open(self):
+        """Abre el diario para añadir segmentos. Devuelve la última entrada completada, desde
+        donde reanudar, o None si no hay un diario previo compatible"""
+        compatible = False
+        if os.path.exists(self.path):
+            compatible, last_entry, valid_bytes = self._scan()
+
+        if not compatible:
+            self.file = open(self.path, "wb")
+            self.file.write(json.dumps({"identity": self.identity}).encode("utf-8") + b"\n")
+            self._sync()
+            return None
+
+        self.file = open(self.path, "r+b")
+        self.file.truncate(valid_bytes)
+        self.file.seek(valid_bytes)
+        return last_entry
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def append(self, segment, text, language=None, pieces=()):
+        """Registra un segmento terminado y devuelve su entrada. `pieces` son las frases del
+        segmento como [inicio, fin, texto] en segundos absolutos del audio"""
+        entry = {"index": segment.index, "start": segment.start, "end": segment.end, "text": text,
+                 "language": language, "pieces": [list(piece) for piece in pieces]}
+        self.file.write(json.dumps(entry, ensure_ascii=False).encode("utf-8") + b"\n")
+        self._sync()
+        return entry
+
+    def entries(self):
+        """Recorre las entradas registradas sin cargar el diario completo en memoria"""
+        with open(self.path, "r", encoding="utf-8") as file:
+            file.readline()
+            for line in file:
+                yield json.loads(line)
+
+    def close(self):
+        if self.file and not self.file.closed:
+            self.file.close()
+
+    def remove(self):
+        os.remove(self.path)
+
+def default_output_path(audio_path, output_dir=None, extension="txt"):
+    """Ruta de transcripción sugerida: <nombre>_transcripcion.<ext> junto al audio o en `output_dir`"""
+    base_name = os.path.splitext(os.path.basename(audio_path))[0]
+    directory = output_dir or os.path.dirname(audio_path)
+    return os.path.join(directory, f"{base_name}_transcripcion.{extension}")
+
+def batch_output_paths(audio_paths, output_dir=None, extension="txt"):
+    """Rutas de salida de un lote. En `output_dir` se conserva la estructura de carpetas bajo el
+    directorio común de los audios, así a/x.mp3 y b/x.mp3 no comparten salida ni diario.
+    Lanza ValueError si aun así dos audios coinciden (p. ej. x.mp3 y x.wav)"""
+    if output_dir and audio_paths:
+        root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in audio_paths])
+    outputs = {}
+    for audio_path in audio_paths:
+        directory = None
+        if output_dir:
+            relative = os.path.relpath(os.path.dirname(os.path.abspath(audio_path)), root)
+            directory = os.path.normpath(os.path.join(output_dir, relative))
+        output_path = default_output_path(audio_path, directory, extension)
+        key = os.path.normcase(os.path.abspath(output_path))
+        if key in outputs:
+            raise ValueError(f"{outputs[key][0]} y {audio_path} tendrían la misma salida: {output_path}")
+        outputs[key] = (audio_path, output_path)
+    return [output_path for _, output_path in outputs.values()]
+
+def collect_audio_files(sources):
+    """Expande un directorio, un archivo o una lista de ambos en la lista ordenada de audios"""
+    if isinstance(sources, str):
+        sources = [sources]
+    files = {}
+    for source in sources:
+        if os.path.isdir(source):
+            paths = [os.path.join(source, name) for name in sorted(os.listdir(source))]
+            paths = [path for path in paths if os.path.isfile(path) and path.lower().endswith(AUDIO_EXTENSIONS)]
+        else:
+            paths = [source] if os.path.isfile(source) else []
+        # Un mismo audio puede aparecer en varios patrones: se transcribe una sola vez
+        for path in paths:
+            files.setdefault(os.path.normcase(os.path.abspath(path)), path)
+    return list(files.values())
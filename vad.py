@@ -0,0 +1,84 @@
+import numpy as np
+from whisper.audio import SAMPLE_RATE
+
+FRAME_SECONDS = 0.03
+PADDING_SECONDS = 0.3    # Margen de voz que se conserva antes y después de cada región
+MARGIN_DB = 12.0         # Cuánto debe superar una trama al ruido de fondo para ser voz
+PEAK_MARGIN_DB = 20.0    # Las tramas a menos de esto del pico cuentan como voz...
+MIN_RANGE_DB = 6.0       # ...si además superan al ruido de fondo al menos en esto
+MIN_DB = -55.0           # Por debajo de este nivel nunca hay voz
+
+def speech_mask(audio):
+    """Clasifica cada trama de 30 ms como voz (True) o silencio (False) según su energía,
+    con un umbral adaptado al ruido de fondo del propio fragmento"""
+    frame = int(FRAME_SECONDS * SAMPLE_RATE)
+    count = len(audio) // frame
+    if count == 0:
+        return np.zeros(0, dtype=bool)
+
+    frames = audio[:count * frame].reshape(count, frame)
+    energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+
+    # En una ventana sin voz el pico es el propio ruido de fondo: sin un margen mínimo sobre
+    # el fondo, el ruido de sala entero pasaría por voz
+    floor = np.percentile(energy_db, 10)
+    threshold = max(MIN_DB, floor + MIN_RANGE_DB, min(floor + MARGIN_DB, energy_db.max() - PEAK_MARGIN_DB))
+    mask = energy_db > threshold
+
+    # Extender cada región de voz para no recortar el inicio ni el final de las palabras
+    padding = int(PADDING_SECONDS / FRAME_SECONDS)
+    if padding:
+        mask = np.convolve(mask, np.ones(2 * padding + 1), mode="same") > 0
+    return mask
+
+def _last_pause(mask, first_speech):
+    """Trama donde empieza la última pausa posterior a `first_speech`, o None si no hay"""
+    silent = np.flatnonzero(~mask[first_speech:]) + first_speech
+    if len(silent) == 0:
+        return None
+    breaks = np.flatnonzero(np.diff(silent) > 1)
+    return silent[breaks[-1] + 1] if len(breaks) else silent[0]
+
+def split_on_pauses(blocks, window_samples):
+    """Reagrupa bloques de audio consecutivos en ventanas de voz de hasta `window_samples`
+    muestras que terminan en una pausa. El silencio entre ventanas se descarta.
+    Produce tuplas (muestra inicial relativa al primer bloque, audio)"""
+    frame = int(FRAME_SECONDS * SAMPLE_RATE)
+    blocks = iter(blocks)
+    pending = np.zeros(0, dtype=np.float32)
+    offset = 0
+    exhausted = False
+
+    while True:
+        # Acumular al menos una ventana completa antes de decidir dónde cortar
+        while not exhausted and len(pending) < window_samples:
+            block = next(blocks, None)
+            if block is None:
+                exhausted = True
+            else:
+                pending = np.concatenate((pending, block))
+
+        if len(pending) == 0:
+            return
+
+        head = pending[:window_samples]
+        mask = speech_mask(head)
+        speech = np.flatnonzero(mask)
+
+        if len(speech) == 0:
+            # Ventana entera en silencio: se descarta sin pasar por el modelo
+            consumed = len(head)
+        else:
+            start = speech[0] * frame
+            is_last = exhausted and len(pending) <= window_samples
+            if is_last:
+                end = min(len(pending), (speech[-1] + 1) * frame)
+            else:
+                pause = _last_pause(mask, speech[0])
+                end = pause * frame if pause is not None else window_samples
+            # El slicing devuelve una vista; `pending` se reemplaza después, no se modifica
+            yield offset + start, pending[start:end]
+            consumed = end
+
+        pending = pending[consumed:]
+        offset += consumed
@@ -0,0 +1,84 @@
+import json
+import os
+
+def format_timestamp(seconds, decimal_marker=","):
+    """HH:MM:SS,mmm (SRT) o HH:MM:SS.mmm (WebVTT)"""
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{decimal_marker}{milliseconds:03d}"
+
+class TranscriptWriter:
+    """Escritor en streaming: cada segmento se escribe y se vuelca al disco en cuanto termina,
+    sin acumular la transcripción en memoria, así otras herramientas pueden seguir el archivo
+    (tail -f) mientras el trabajo avanza. Las entradas son las del diario: inicio y fin del
+    segmento, texto, idioma y `pieces`, las frases con tiempos absolutos en el audio"""
+    extension = "txt"
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.file = open(output_path, "w", encoding="utf-8")
+        self.begin()
+
+    def begin(self):
+        pass
+
+    def write_entry(self, entry):
+        raise NotImplementedError
+
+    def write(self, entry):
+        self.write_entry(entry)
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+
+class TextWriter(TranscriptWriter):
+    """Texto plano: los segmentos seguidos, separados por un espacio"""
+    extension = "txt"
+
+    def write_entry(self, entry):
+        if entry["text"]:
+            self.file.write(entry["text"] + " ")
+
+class SrtWriter(TranscriptWriter):
+    extension = "srt"
+
+    def begin(self):
+        self.counter = 0
+
+    def write_entry(self, entry):
+        for start, end, text in entry["pieces"]:
+            self.counter += 1
+            self.file.write(f"{self.counter}\n{format_timestamp(start)} --> {format_timestamp(end)}\n{text}\n\n")
+
+class VttWriter(TranscriptWriter):
+    extension = "vtt"
+
+    def begin(self):
+        self.file.write("WEBVTT\n\n")
+
+    def write_entry(self, entry):
+        for start, end, text in entry["pieces"]:
+            self.file.write(f"{format_timestamp(start, '.')} --> {format_timestamp(end, '.')}\n{text}\n\n")
+
+class JsonLinesWriter(TranscriptWriter):
+    """Una línea JSON por frase: {"start", "end", "text", "segment", "language"}"""
+    extension = "jsonl"
+
+    def write_entry(self, entry):
+        for start, end, text in entry["pieces"]:
+            line = {"start": round(start, 3), "end": round(end, 3), "text": text, "segment": entry["index"],
+                    "language": entry.get("language")}
+            self.file.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+WRITERS = {writer.extension: writer for writer in (TextWriter, SrtWriter, VttWriter, JsonLinesWriter)}
+
+def writer_for_path(output_path):
+    """Escritor según la extensión del archivo de salida (texto plano si no se reconoce)"""
+    extension = os.path.splitext(output_path)[1].lower().lstrip(".")
+    return WRITERS.get(extension, TextWriter)(output_path)